@@ -0,0 +1,70 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+
+from api.cache import (INGREDIENTS_CACHE_NAMESPACE, get_data_version,
+                       get_queryset_marker)
+from recipes.models import Ingredient
+
+# как часто сверять индекс с базой, сек
+INDEX_CHECK_INTERVAL = 60
+
+
+class IngredientPrefixIndex:
+    """
+    Отсортированный индекс ингредиентов в памяти процесса.
+
+    Строится при первом обращении и перестраивается, когда сигналы
+    Ingredient меняют версию данных справочника. Раз в
+    INDEX_CHECK_INTERVAL число строк и наибольший id сверяются с базой:
+    так индекс узнает об ингредиентах, загруженных другим процессом
+    или в обход сигналов (load_data).
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._marker = None
+        self._checked_at = None
+        self._keys = []
+        self._ingredients = []
+
+    def _refresh(self, version):
+        now = time.monotonic()
+        if self._version == version and (
+            now - self._checked_at < INDEX_CHECK_INTERVAL
+        ):
+            return
+        marker = get_queryset_marker(Ingredient.objects.all())
+        self._checked_at = now
+        if self._version != version or self._marker != marker:
+            self._build(version, marker)
+
+    def _build(self, version, marker):
+        ingredients = sorted(
+            Ingredient.objects.all(),
+            key=lambda ingredient: (ingredient.name.casefold(), ingredient.id)
+        )
+        self._keys = [ingredient.name.casefold() for ingredient in ingredients]
+        self._ingredients = ingredients
+        self._version = version
+        self._marker = marker
+
+    def search(self, prefix, limit=None):
+        """Ингредиенты, название которых начинается с prefix."""
+        version = get_data_version(INGREDIENTS_CACHE_NAMESPACE)
+        with self._lock:
+            self._refresh(version)
+            keys, ingredients = self._keys, self._ingredients
+        prefix = prefix.casefold()
+        result = []
+        for position in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[position].startswith(prefix):
+                break
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(ingredients[position])
+        return result
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,198 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+RECIPES_CACHE_NAMESPACE = 'recipes'
+TAGS_CACHE_NAMESPACE = 'tags'
+INGREDIENTS_CACHE_NAMESPACE = 'ingredients'
+SHOPPING_CART_CACHE_NAMESPACE = 'shopping_cart:{}'
+# поля автора, которые попадают в ответы с рецептами
+AUTHOR_CACHED_FIELDS = (
+    'email', 'username', 'first_name', 'last_name', 'avatar',
+    'avatar_variants',
+)
+CACHED_QUERY_PARAMS = (
+    'tags', 'author', 'page', 'limit', 'cursor', 'count', 'search',
+    'fields', 'omit',
+)
+
+response_cache = caches['responses']
+
+
+def get_cache_version(namespace):
+    """
+    Возвращает текущую версию пространства ключей кеша.
+
+    Ключ версии живет не дольше записей кеша: при локальном кеше каждого
+    процесса это ограничивает время, в течение которого процесс,
+    не получивший сигнал об изменении, отдает устаревшую версию.
+    """
+    key = f'version:{namespace}'
+    version = response_cache.get(key)
+    if version is None:
+        # Счетчик начинается с текущего времени, чтобы после вытеснения
+        # ключа версии старые записи не стали снова актуальными.
+        response_cache.add(key, time.time_ns())
+        version = response_cache.get(key)
+    return version
+
+
+def get_data_version(namespace):
+    """
+    Версия данных пространства для валидаторов условных запросов.
+
+    В отличие от get_cache_version хранится без срока жизни и меняется
+    только при изменении данных, поэтому ETag остается прежним, пока
+    данные не изменились. Изменения в другом процессе эта версия
+    отражает только при общем кеше (RESPONSE_CACHE_BACKEND); с
+    локальным кешем валидаторы дополняются признаками из базы.
+    """
+    key = f'data-version:{namespace}'
+    version = response_cache.get(key)
+    if version is None:
+        response_cache.add(key, time.time_ns(), timeout=None)
+        version = response_cache.get(key)
+    return version
+
+
+def get_queryset_marker(queryset):
+    """
+    Число строк и наибольший id выборки: меняются при добавлении и
+    удалении строк, в том числе в другом процессе и в обход сигналов.
+    """
+    marker = queryset.order_by().aggregate(count=Count('pk'), last=Max('pk'))
+    return marker['count'], marker['last']
+
+
+def bump_cache_version(namespace):
+    """Увеличивает версию, делая недоступными все записи пространства."""
+    try:
+        response_cache.incr(f'version:{namespace}')
+    except ValueError:
+        response_cache.set(f'version:{namespace}', time.time_ns())
+    try:
+        response_cache.incr(f'data-version:{namespace}')
+    except ValueError:
+        response_cache.set(
+            f'data-version:{namespace}', time.time_ns(), timeout=None
+        )
+
+
+def make_cache_key(namespace, request):
+    """
+    Ключ кеша по пути запроса и нормализованной строке параметров.
+
+    Если ответ обернут в conditional_response, в ключ входит и ETag:
+    иначе после изменения в другом процессе под новым ETag отдавался бы
+    закешированный старый ответ.
+    """
+    query = urlencode(sorted(
+        (param, value)
+        for param in CACHED_QUERY_PARAMS
+        for value in sorted(request.query_params.getlist(param))
+    ))
+    return (
+        f'{namespace}:{get_cache_version(namespace)}:'
+        f'{getattr(request, "etag", "")}:'
+        f'{request.get_host()}{request.path}?{query}'
+    )
+
+
+def cache_stream(key, chunks, max_size):
+    """
+    Отдает части потока дальше и, если поток не длиннее max_size байт,
+    после его завершения сохраняет содержимое в кеш под ключом key.
+
+    Длинный поток в память не собирается: накопленное отбрасывается,
+    как только размер превысит max_size.
+    """
+    content, size = [], 0
+    for chunk in chunks:
+        if content is not None:
+            size += len(chunk)
+            if size <= max_size:
+                content.append(chunk)
+            else:
+                content = None
+        yield chunk
+    if content is not None:
+        response_cache.set(key, b''.join(content))
+
+
+def make_etag(*parts):
+    """Сильный ETag из переданных признаков версии ресурса."""
+    return quote_etag(
+        hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+    )
+
+
+def cache_anonymous_response(namespace):
+    """Кеширует ответы анонимным пользователям на GET-запросы."""
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return method(view, request, *args, **kwargs)
+            key = make_cache_key(namespace, request)
+            data = response_cache.get(key)
+            if data is not None:
+                return Response(data)
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response_cache.set(key, response.data)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_response(get_validators, max_age=0, per_user=False):
+    """
+    Обрабатывает If-None-Match и If-Modified-Since.
+
+    get_validators(view, request, *args, **kwargs) возвращает пару
+    (etag, last_modified), где last_modified — datetime или None.
+    Если ресурс не изменился, ответ 304 отдается без вызова сериализатора.
+    Ответы, зависящие от пользователя (per_user), помечаются как private
+    для авторизованных запросов, чтобы их не сохранял общий кеш nginx.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            etag, last_modified = get_validators(
+                view, request, *args, **kwargs
+            )
+            timestamp = last_modified and int(last_modified.timestamp())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=timestamp
+            )
+            if response is None:
+                request.etag = etag
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+            if per_user and request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True, max_age=max_age,
+                    must_revalidate=True
+                )
+            if per_user:
+                patch_vary_headers(response, ('Authorization',))
+            return response
+        return wrapper
+    return decorator
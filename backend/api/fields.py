@@ -0,0 +1,185 @@
+import binascii
+
+import filetype
+from django.core.exceptions import ValidationError as DjangoValidationError
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from api.parsers import Base64UploadedFile, decode_base64_string
+from recipes.images import VARIANT_FORMATS
+
+
+class BatchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField, который разрешает ключи пачкой.
+
+    Сам по себе проверяет только тип ключа. Объекты подставляются одним
+    запросом filter(pk__in=...) на весь список: при many=True —
+    в BatchedManyRelatedField, во вложенных сериализаторах — в
+    BatchedListSerializer. Ошибки те же, что у PrimaryKeyRelatedField.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
+
+    def to_internal_value(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.get_queryset().model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def resolve(self, pks):
+        """Объекты по ключам одним запросом: {pk: объект}."""
+        return self.get_queryset().in_bulk(set(pks))
+
+    def get_missing_error(self, pk):
+        return self.error_messages['does_not_exist'].format(pk_value=pk)
+
+
+class BatchedManyRelatedField(serializers.ManyRelatedField):
+    """Список ключей BatchedPrimaryKeyRelatedField с одним запросом."""
+
+    def to_internal_value(self, data):
+        pks = super().to_internal_value(data)
+        objects = self.child_relation.resolve(pks)
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+        if missing:
+            raise serializers.ValidationError([
+                self.child_relation.get_missing_error(pk) for pk in missing
+            ])
+        return [objects[pk] for pk in pks]
+
+
+class BatchedListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer, который разрешает BatchedPrimaryKeyRelatedField
+    всех элементов одним запросом на поле.
+    """
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        errors = [{} for _ in items]
+        for field in self.child.fields.values():
+            if not isinstance(field, BatchedPrimaryKeyRelatedField):
+                continue
+            objects = field.resolve(
+                item[field.source] for item in items if field.source in item
+            )
+            for item, item_errors in zip(items, errors):
+                if field.source not in item:
+                    continue
+                pk = item[field.source]
+                if pk in objects:
+                    item[field.source] = objects[pk]
+                else:
+                    item_errors[field.field_name] = [
+                        field.get_missing_error(pk)
+                    ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+
+class ImageVariantsField(serializers.Field):
+    """
+    Ссылки на уменьшенные копии изображения по размерам и форматам.
+
+    Пока варианты для текущего файла не построены, вместо них отдается
+    ссылка на оригинал.
+    """
+
+    def __init__(self, image_field, variants_field, sizes, **kwargs):
+        self.image_field = image_field
+        self.variants_field = variants_field
+        self.sizes = sizes
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def get_url(self, storage, name):
+        url = storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        if not image:
+            return None
+        variants = getattr(instance, self.variants_field)
+        if variants.get('source') != image.name:
+            variants = {}
+        original = self.get_url(image.storage, image.name)
+        return {
+            size_name: {
+                extension: (
+                    self.get_url(
+                        image.storage, variants[size_name][extension]
+                    ) if extension in variants.get(size_name, {})
+                    else original
+                )
+                for extension in VARIANT_FORMATS
+            }
+            for size_name in self.sizes
+        }
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """
+    Base64ImageField, который не держит декодированный файл в памяти.
+
+    Принимает строку base64 (декодируется по частям) или файл, уже
+    декодированный Base64JSONParser. Формат определяется filetype по
+    заголовку файла, Pillow проверяет изображение, читая его из файла,
+    а не из копии в памяти.
+    """
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if isinstance(data, str):
+            try:
+                data = decode_base64_string(data)
+            except (binascii.Error, ValueError):
+                raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        elif not isinstance(data, Base64UploadedFile):
+            raise serializers.ValidationError(
+                f'Invalid type. This is not an base64 string: {type(data)}'
+            )
+        if not data.valid:
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        extension = self.get_file_extension(data.name, data.file)
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        try:
+            with Image.open(data.file) as image:
+                image.verify()
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            data.file.seek(0)
+        data.name = f'{self.get_file_name(data)}.{extension}'
+        if not self.trust_provided_content_type:
+            data.content_type = None
+        return serializers.FileField.to_internal_value(self, data)
+
+    def get_file_extension(self, filename, decoded_file):
+        extension = filetype.guess_extension(decoded_file)
+        if extension is None:
+            try:
+                with Image.open(decoded_file) as image:
+                    extension = image.format.lower()
+            except OSError:
+                raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+            finally:
+                decoded_file.seek(0)
+        return 'jpg' if extension == 'jpeg' else extension
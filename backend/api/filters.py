@@ -1,6 +1,10 @@
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
 
+from api.autocomplete import ingredient_index
 from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 
 
 class RecipesFilter(filters.FilterSet):
@@ -13,12 +17,41 @@ class RecipesFilter(filters.FilterSet):
     )
     is_favorited = filters.BooleanFilter(method='filter_user_relation')
     is_in_shopping_cart = filters.BooleanFilter(method='filter_user_relation')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_in_shopping_cart', 'is_favorited')
+        fields = (
+            'tags', 'author', 'is_in_shopping_cart', 'is_favorited', 'search'
+        )
 
     def filter_user_relation(self, queryset, name, value):
         if not self.request.user.id:
             return queryset
         return queryset.filter(**{name: value})
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+
+class IngredientPrefixFilter(BaseFilterBackend):
+    """
+    Поиск ингредиентов по началу названия через индекс в памяти.
+
+    Возвращает все совпадения; параметр limit ограничивает их число.
+    """
+
+    search_param = api_settings.SEARCH_PARAM
+    limit_param = 'limit'
+
+    def filter_queryset(self, request, queryset, view):
+        prefix = request.query_params.get(self.search_param)
+        if not prefix or view.action != 'list':
+            return queryset
+        try:
+            limit = int(request.query_params.get(self.limit_param))
+        except (TypeError, ValueError):
+            limit = None
+        if limit is not None and limit <= 0:
+            limit = None
+        return ingredient_index.search(prefix, limit)
@@ -0,0 +1,72 @@
+import base64
+import os
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.management import BaseCommand
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json
+
+from api.fields import StreamingBase64ImageField
+from api.parsers import Base64JSONParser
+
+
+class Command(BaseCommand):
+    """Сравнивает пик памяти при разборе изображения в base64."""
+
+    help = (
+        'Замеряет время и пик памяти Python на одну загрузку изображения '
+        'в base64: JSONParser + Base64ImageField против Base64JSONParser '
+        '+ StreamingBase64ImageField. Тело запроса создается заранее и в '
+        'замер не входит. Память Pillow под пиксели tracemalloc не видит, '
+        'но проверка verify() пиксели и не декодирует.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=float, default=10,
+                            help='Размер изображения, МБ.')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        body = self.make_body(int(options['size'] * 1024 * 1024))
+        self.stdout.write(f'тело запроса {len(body) / 1024 / 1024:.1f} МБ')
+        for title, parser, field_class in (
+            ('JSONParser + Base64ImageField', JSONParser, Base64ImageField),
+            ('Base64JSONParser + StreamingBase64ImageField',
+             Base64JSONParser, StreamingBase64ImageField),
+        ):
+            self.measure(title, parser, field_class, body,
+                         options['repeat'])
+
+    @staticmethod
+    def make_body(size):
+        """JSON с PNG из случайных пикселей: он почти не сжимается."""
+        side = int((size / 3) ** 0.5)
+        image = Image.frombytes('RGB', (side, side),
+                                os.urandom(side * side * 3))
+        buffer = BytesIO()
+        image.save(buffer, 'PNG', compress_level=1)
+        encoded = base64.b64encode(buffer.getvalue()).decode()
+        return json.dumps({
+            'name': 'Рецепт', 'image': f'data:image/png;base64,{encoded}',
+        }).encode()
+
+    def measure(self, title, parser_class, field_class, body, repeat):
+        peaks = []
+        started = time.perf_counter()
+        for _ in range(repeat):
+            tracemalloc.start()
+            data = parser_class().parse(BytesIO(body))
+            image = field_class().run_validation(data['image'])
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peaks.append(peak)
+            image.close()
+        elapsed = (time.perf_counter() - started) / repeat
+        self.stdout.write(
+            f'{title}: {elapsed * 1000:.0f} мс, пик памяти '
+            f'{max(peaks) / 1024 / 1024:.1f} МиБ на загрузку'
+        )
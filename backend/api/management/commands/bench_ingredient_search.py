@@ -0,0 +1,55 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from api.autocomplete import ingredient_index
+from recipes.constants import Constants
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    """Сравнивает поиск ингредиентов по индексу в памяти и через БД."""
+
+    help = (
+        'Замеряет поиск ингредиентов по началу названия: индекс в памяти '
+        'против запроса name ILIKE в базе данных. Используются префиксы '
+        'названий из data/ingredients.json; справочник должен быть '
+        'загружен командой load_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix-length', type=int, default=2)
+        parser.add_argument('--limit', type=int,
+                            default=Constants.INGREDIENTS_SEARCH_LIMIT)
+
+    def handle(self, *args, **options):
+        path = os.path.join(settings.JSON_FILES_DIR, 'ingredients.json')
+        with open(path, encoding='utf-8') as f:
+            names = [row['name'] for row in json.load(f)]
+        if Ingredient.objects.count() < len(names):
+            self.stdout.write(self.style.WARNING(
+                'В базе меньше ингредиентов, чем в ingredients.json: '
+                'выполните load_data.'
+            ))
+        length, limit = options['prefix_length'], options['limit']
+        prefixes = [name[:length] for name in names]
+        ingredient_index.search('', limit)
+        for title, lookup in (
+            ('Индекс в памяти', lambda prefix: ingredient_index.search(
+                prefix, limit
+            )),
+            ('База данных', lambda prefix: list(
+                Ingredient.objects.filter(name__istartswith=prefix)[:limit]
+            )),
+        ):
+            started = time.perf_counter()
+            for prefix in prefixes:
+                lookup(prefix)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{title}: {len(prefixes)} запросов за {elapsed:.3f} с, '
+                f'{elapsed / len(prefixes) * 1e6:.1f} мкс на запрос'
+            )
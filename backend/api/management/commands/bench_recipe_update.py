@@ -0,0 +1,131 @@
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.serializers import RecipeWriteSerializer
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    """Сравнивает обновление состава рецепта по разнице и с нуля."""
+
+    help = (
+        'Замеряет запись в базу при PATCH рецепта: удаление и повторное '
+        'создание всех ингредиентов против обновления по разнице. '
+        'Тестовый рецепт создается в транзакции, которая затем '
+        'откатывается; справочники ингредиентов и тегов должны быть '
+        'загружены.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients', type=int, default=30)
+        parser.add_argument('--changed', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        ingredients = list(Ingredient.objects.all()[:options['ingredients']])
+        tags = list(Tag.objects.all()[:1])
+        if len(ingredients) < options['ingredients'] or not tags:
+            raise CommandError(
+                'Недостаточно ингредиентов или тегов: выполните load_data.'
+            )
+        with transaction.atomic():
+            author = User.objects.create(
+                username='bench_recipe_author',
+                email='bench_recipe_author@example.com',
+            )
+            for title, update in (
+                ('Удаление и создание заново', self.recreate),
+                ('Обновление по разнице', self.update_by_diff),
+            ):
+                recipe = self.create_recipe(author, ingredients, tags)
+                self.measure(title, update, recipe, ingredients, tags,
+                             options['changed'], options['repeat'])
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def create_recipe(author, ingredients, tags):
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание',
+            image='recipes/bench.png', cooking_time=1,
+        )
+        recipe.tags.set(tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        )
+        return recipe
+
+    @staticmethod
+    def recreate(recipe, data):
+        recipe.tags.set(data['tags'])
+        recipe.recipe_ingredients.all().delete()
+        RecipeWriteSerializer.create_ingredients(recipe, data['ingredients'])
+        recipe.save()
+
+    @staticmethod
+    def update_by_diff(recipe, data):
+        recipe = Recipe.objects.prefetch_related(
+            'tags', 'recipe_ingredients'
+        ).get(pk=recipe.pk)
+        RecipeWriteSerializer().update(recipe, data)
+
+    def measure(self, title, update, recipe, ingredients, tags, changed,
+                repeat):
+        statements, rows = Counter(), Counter()
+        started = time.perf_counter()
+        for attempt in range(1, repeat + 1):
+            data = {
+                'tags': tags,
+                'ingredients': [
+                    {'id': ingredient,
+                     'amount': attempt + 1 if number < changed else 1}
+                    for number, ingredient in enumerate(ingredients)
+                ],
+                'name': 'Рецепт',
+                'text': 'Описание',
+                'cooking_time': 1,
+            }
+            before = self.get_rows(recipe)
+            with CaptureQueriesContext(connection) as queries:
+                update(recipe, data)
+            after = self.get_rows(recipe)
+            rows.update(
+                deleted=len(before.keys() - after.keys()),
+                inserted=len(after.keys() - before.keys()),
+                updated=sum(
+                    before[pk] != after[pk] for pk in before.keys() & after
+                ),
+            )
+            statements.update(
+                query['sql'].split(None, 1)[0].upper()
+                for query in queries.captured_queries
+            )
+        elapsed = time.perf_counter() - started
+        writes = ', '.join(
+            f'{statement} {statements[statement] / repeat:.1f}'
+            for statement in WRITE_STATEMENTS
+        )
+        self.stdout.write(
+            f'{title}: {elapsed / repeat * 1000:.1f} мс на обновление\n'
+            f'  запросов на запись за обновление: {writes}\n'
+            f'  строк ингредиентов за обновление: '
+            f'удалено {rows["deleted"] / repeat:.1f}, '
+            f'добавлено {rows["inserted"] / repeat:.1f}, '
+            f'изменено {rows["updated"] / repeat:.1f}'
+        )
+
+    @staticmethod
+    def get_rows(recipe):
+        return dict(
+            RecipeIngredient.objects.filter(recipe=recipe)
+            .values_list('pk', 'amount')
+        )
@@ -0,0 +1,83 @@
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+from api.services import prefetch_recent_recipes
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Сравнивает выборку последних рецептов авторов в подписках."""
+
+    help = (
+        'Замеряет время и пик памяти при выборке последних recipes_limit '
+        'рецептов для страницы подписок: prefetch всех рецептов со срезом '
+        'в Python против оконного запроса ROW_NUMBER(). Тестовые авторы '
+        'и рецепты создаются в транзакции, которая затем откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=6)
+        parser.add_argument('--recipes', type=int, default=3000)
+        parser.add_argument('--recipes-limit', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            authors = self.create_authors(options['authors'],
+                                          options['recipes'])
+            limit = options['recipes_limit']
+            for title, fetch in (
+                ('prefetch_related + срез', self.fetch_sliced),
+                ('ROW_NUMBER() по авторам', self.fetch_windowed),
+            ):
+                self.measure(title, fetch, authors, limit)
+            transaction.set_rollback(True)
+
+    def create_authors(self, count, recipes_count):
+        authors = User.objects.bulk_create(
+            User(username=f'bench_author_{number}',
+                 email=f'bench_author_{number}@example.com',
+                 first_name='Автор', last_name=str(number))
+            for number in range(count)
+        )
+        if not all(author.pk for author in authors):
+            authors = list(User.objects.filter(
+                username__startswith='bench_author_'
+            ))
+        for author in authors:
+            Recipe.objects.bulk_create((
+                Recipe(author=author, name=f'Рецепт {number}',
+                       image='recipes/bench.png', text='Описание',
+                       cooking_time=1)
+                for number in range(recipes_count)
+            ), batch_size=1000)
+        return [author.pk for author in authors]
+
+    @staticmethod
+    def fetch_sliced(page, limit):
+        prefetch_related_objects(page, 'recipes')
+        return [author.recipes.all()[:limit] for author in page]
+
+    @staticmethod
+    def fetch_windowed(page, limit):
+        prefetch_recent_recipes(page, limit)
+        return [author.recent_recipes for author in page]
+
+    def measure(self, title, fetch, author_ids, limit):
+        page = list(User.objects.filter(pk__in=author_ids))
+        tracemalloc.start()
+        started = time.perf_counter()
+        recipes = sum(len(list(items)) for items in fetch(page, limit))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f'{title}: {recipes} рецептов за {elapsed * 1000:.1f} мс, '
+            f'пик памяти {peak / 1024:.0f} КиБ'
+        )
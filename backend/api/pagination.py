@@ -1,6 +1,109 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+def get_table_estimate(queryset, connection):
+    """Оценка числа строк таблицы по статистике pg_class.reltuples."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            (connection.ops.quote_name(queryset.model._meta.db_table),)
+        )
+        row = cursor.fetchone()
+    return row[0] if row else -1
+
+
+def get_plan_estimate(queryset, connection):
+    """Оценка числа строк выборки планировщиком по EXPLAIN."""
+    sql, params = queryset.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_count(queryset):
+    """
+    Возвращает приблизительное количество объектов выборки.
+
+    На PostgreSQL для выборки без условий берется reltuples из pg_class,
+    для выборки с условиями — оценка планировщика из EXPLAIN. Если оценка
+    меньше ESTIMATED_COUNT_THRESHOLD, выполняется точный COUNT(*):
+    на небольших выборках он дешев, а оценка может сильно ошибаться.
+    На остальных СУБД всегда выполняется COUNT(*).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    query = queryset.query
+    if query.where or query.distinct or query.combinator:
+        estimate = get_plan_estimate(queryset, connection)
+    else:
+        estimate = get_table_estimate(queryset, connection)
+    if estimate < settings.ESTIMATED_COUNT_THRESHOLD:
+        return queryset.count()
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, считающий количество объектов через estimate_count."""
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            return estimate_count(self.object_list)
+        return super().count
 
 
 class PageNumberLimitPagination(PageNumberPagination):
-    """Пагинатор для рецептов."""
+    """
+    Пагинатор для рецептов.
+
+    Поле count — точное количество объектов. С параметром count=approx,
+    как и в RecipeCursorPagination, считается приблизительное
+    количество через estimate_count.
+    """
+    page_size_query_param = 'limit'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = (
+            EstimatedCountPaginator
+            if request.query_params.get(self.count_query_param) == 'approx'
+            else Paginator
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Курсорный пагинатор для ленты рецептов.
+
+    Не считает общее количество рецептов и не использует OFFSET
+    для глубоких страниц. По запросу с параметром count=approx
+    добавляет в ответ приблизительное количество рецептов.
+    """
+
+    ordering = ('-pub_date', '-id')
     page_size_query_param = 'limit'
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'approx':
+            self.count = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = {'count': self.count, **response.data}
+        return response
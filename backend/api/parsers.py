@@ -0,0 +1,160 @@
+import binascii
+import re
+import string
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json
+
+READ_CHUNK_SIZE = 64 * 1024
+DATA_URI_RE = re.compile(
+    rb'(?<!\\)"data:(image/[\w.+-]{1,50});base64,'
+)
+# самое длинное начало data URI; столько байт текста придерживается
+# до следующей порции, чтобы не пропустить разрезанное начало
+DATA_URI_MAX_LENGTH = 80
+NON_BASE64_BYTES = bytes(
+    set(range(256))
+    - set((string.ascii_letters + string.digits + '+/=').encode())
+)
+
+
+class Base64UploadedFile(UploadedFile):
+    """
+    Файл, декодированный из base64 во временный файл.
+
+    valid = False, если строка base64 оборвана: ошибку выдает поле
+    сериализатора, а не парсер всего запроса.
+    """
+
+    def __init__(self, *args, valid=True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.valid = valid
+
+
+class Base64Decoder:
+    """
+    Декодирует base64 по частям в SpooledTemporaryFile.
+
+    Файл остается в памяти, пока не превысит
+    FILE_UPLOAD_MAX_MEMORY_SIZE, дальше пишется на диск. Символы вне
+    алфавита base64 (переводы строк, экранирование \\/ в JSON)
+    отбрасываются, как в base64.b64decode.
+    """
+
+    def __init__(self, content_type=None):
+        self.file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        self.content_type = content_type
+        self.size = 0
+        self.tail = b''
+
+    def feed(self, data):
+        data = self.tail + data.translate(None, NON_BASE64_BYTES)
+        length = len(data) - len(data) % 4
+        self.tail = data[length:]
+        if length:
+            self.size += self.file.write(binascii.a2b_base64(data[:length]))
+
+    def close(self):
+        """Завершает декодирование и возвращает файл."""
+        self.file.seek(0)
+        return Base64UploadedFile(
+            self.file, name=f'{uuid.uuid4()}',
+            content_type=self.content_type, size=self.size,
+            valid=not self.tail,
+        )
+
+
+def decode_base64_string(data):
+    """Декодирует строку base64 (с заголовком data: или без) по частям."""
+    content_type = None
+    start = data.find(';base64,')
+    if start != -1:
+        content_type = data[:start].replace('data:', '')
+        start += len(';base64,')
+    decoder = Base64Decoder(content_type)
+    for offset in range(max(start, 0), len(data), READ_CHUNK_SIZE):
+        decoder.feed(data[offset:offset + READ_CHUNK_SIZE].encode('ascii'))
+    uploaded_file = decoder.close()
+    if not uploaded_file.valid:
+        raise binascii.Error('Incorrect padding')
+    return uploaded_file
+
+
+def replace_placeholders(data, files):
+    if isinstance(data, dict):
+        return {
+            key: replace_placeholders(value, files)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [replace_placeholders(value, files) for value in data]
+    if isinstance(data, str):
+        return files.get(data, data)
+    return data
+
+
+class Base64JSONParser(JSONParser):
+    """
+    JSON-парсер, декодирующий изображения data:image/...;base64,...
+    по мере чтения тела запроса.
+
+    Строки data URI не попадают в разбираемый JSON: их содержимое
+    сразу пишется в Base64Decoder, а в тексте остается метка, которую
+    после разбора заменяет Base64UploadedFile. Так в памяти нет ни
+    всего тела запроса, ни строки base64, ни декодированных байт.
+    Принимает их StreamingBase64ImageField.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        token = uuid.uuid4().hex
+        files = {}
+        text = bytearray()
+        buffer = b''
+        decoder = None
+        try:
+            for chunk in iter(lambda: stream.read(READ_CHUNK_SIZE), b''):
+                buffer += chunk
+                while buffer:
+                    if decoder is not None:
+                        end = buffer.find(b'"')
+                        if end == -1:
+                            decoder.feed(buffer)
+                            buffer = b''
+                            break
+                        decoder.feed(buffer[:end])
+                        buffer = buffer[end + 1:]
+                        placeholder = f'{token}:{len(files)}'
+                        files[placeholder] = decoder.close()
+                        text += b'"%s"' % placeholder.encode()
+                        decoder = None
+                        continue
+                    match = DATA_URI_RE.search(buffer)
+                    if match is None:
+                        keep = min(len(buffer), DATA_URI_MAX_LENGTH)
+                        text += buffer[:len(buffer) - keep]
+                        buffer = buffer[len(buffer) - keep:]
+                        break
+                    text += buffer[:match.start()]
+                    decoder = Base64Decoder(match.group(1).decode())
+                    buffer = buffer[match.end():]
+            if decoder is not None:
+                raise ValueError('Unterminated string')
+            text += buffer
+            parse_constant = json.strict_constant if self.strict else None
+            data = json.loads(
+                text.decode(encoding), parse_constant=parse_constant
+            )
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+        if files:
+            data = replace_placeholders(data, files)
+        return data
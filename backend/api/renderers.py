@@ -0,0 +1,111 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+
+    Строит документ по частям из итератора ингредиентов, поэтому
+    список целиком не хранится в памяти.
+    """
+
+    charset = 'utf-8'
+
+    def get_header(self):
+        return ''
+
+    def render_item(self, item):
+        raise NotImplementedError
+
+    def get_footer(self):
+        return ''
+
+    def stream(self, items):
+        yield self.get_header().encode(self.charset)
+        for item in items:
+            yield self.render_item(item).encode(self.charset)
+        yield self.get_footer().encode(self.charset)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.stream(data or ()))
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    """Список покупок в виде текста."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def get_header(self):
+        return 'Список покупок:\n'
+
+    def render_item(self, item):
+        return (
+            f'{item["name"]} '
+            f'{item["measurement_unit"]} - '
+            f'{item["total_amount"]}\n'
+        )
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    """Список покупок в формате CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+    columns = ('name', 'measurement_unit', 'total_amount')
+
+    class LineBuffer:
+        """Буфер, возвращающий записанную строку вместо ее сохранения."""
+
+        def write(self, value):
+            return value
+
+    def __init__(self):
+        self.writer = csv.writer(self.LineBuffer())
+
+    def get_header(self):
+        return self.writer.writerow(self.columns)
+
+    def render_item(self, item):
+        return self.writer.writerow(item[column] for column in self.columns)
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    """Список покупок в формате JSON."""
+
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, items):
+        separator = ''
+        yield b'['
+        for item in items:
+            yield (separator + json.dumps(
+                item, ensure_ascii=False
+            )).encode(self.charset)
+            separator = ','
+        yield b']'
+
+
+class ShoppingListMarkdownRenderer(ShoppingListRenderer):
+    """Список покупок в виде таблицы Markdown."""
+
+    media_type = 'text/markdown'
+    format = 'md'
+
+    def get_header(self):
+        return (
+            '# Список покупок\n\n'
+            '| Ингредиент | Количество | Единицы измерения |\n'
+            '| --- | ---: | --- |\n'
+        )
+
+    def render_item(self, item):
+        name = item['name'].replace('|', '\\|')
+        return (
+            f'| {name} | {item["total_amount"]} '
+            f'| {item["measurement_unit"]} |\n'
+        )
@@ -1,39 +1,83 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from drf_extra_fields.fields import Base64ImageField
-from rest_framework import serializers
+from rest_framework import permissions, serializers
 
+from api.fields import (BatchedListSerializer, BatchedPrimaryKeyRelatedField,
+                        ImageVariantsField, StreamingBase64ImageField)
+from api.services import get_recipes_limit, prefetch_recent_recipes
 from recipes.constants import Constants
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from users.models import Follow
+from recipes.images import AVATAR_SIZES, RECIPE_IMAGE_SIZES
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.shopping_list import update_recipe_in_shopping_lists
+from recipes.storage import ContentAddressedStorage
 
 User = get_user_model()
 
 
-class UserDetailSerializer(DjoserUserSerializer):
+class SparseFieldsetMixin:
+    """
+    Выбор полей ответа параметрами fields и omit.
+
+    ?fields=id,name оставляет только перечисленные поля, ?omit=text
+    убирает указанные. Параметры действуют лишь на сериализатор верхнего
+    уровня и только в запросах на чтение: вложенные сериализаторы и
+    ответы на POST, PUT, PATCH отдают все поля.
+    """
+
+    fields_param = 'fields'
+    omit_param = 'omit'
+
+    @classmethod
+    def get_requested_fields(cls, request):
+        """Имена полей из Meta.fields, которые нужно отдать в ответе."""
+        fields = cls.Meta.fields
+        params = (
+            request.query_params
+            if request is not None
+            and request.method in permissions.SAFE_METHODS
+            else {}
+        )
+        if params.get(cls.fields_param):
+            requested = params[cls.fields_param].split(',')
+            fields = [field for field in fields if field in requested]
+        if params.get(cls.omit_param):
+            omitted = params[cls.omit_param].split(',')
+            fields = [field for field in fields if field not in omitted]
+        return frozenset(fields)
+
+    def get_field_names(self, declared_fields, info):
+        field_names = super().get_field_names(declared_fields, info)
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return field_names
+        requested = self.get_requested_fields(self.context.get('request'))
+        return [field for field in field_names if field in requested]
+
+
+class UserDetailSerializer(SparseFieldsetMixin, DjoserUserSerializer):
     """Сериализатор для просмотра пользователей."""
 
-    is_subscribed = serializers.SerializerMethodField(read_only=True)
+    is_subscribed = serializers.BooleanField(read_only=True, default=False)
+    avatar_variants = ImageVariantsField(
+        'avatar', 'avatar_variants', AVATAR_SIZES
+    )
 
     class Meta(DjoserUserSerializer.Meta):
         fields = DjoserUserSerializer.Meta.fields + (
             'is_subscribed',
-            'avatar'
-        )
-
-    def get_is_subscribed(self, obj):
-        request = self.context['request']
-        return (
-            request.user.is_authenticated
-            and obj.subscriptions_to_author.filter(user=request.user).exists()
+            'avatar',
+            'avatar_variants',
         )
 
 
 class AvatarSerializer(serializers.ModelSerializer):
     """Сериализатор для аватара."""
 
-    avatar = Base64ImageField(required=True)
+    avatar = StreamingBase64ImageField(required=True)
 
     class Meta:
         model = User
@@ -72,7 +116,7 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
 
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
     """Сериализатор для создания ингредиентов рецепта."""
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all(),)
+    id = BatchedPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
     amount = serializers.IntegerField(
         min_value=Constants.MIN_AMOUNT,
         error_messages={
@@ -84,19 +128,23 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
+        list_serializer_class = BatchedListSerializer
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сериализатор для коротких рецептов."""
 
     image = Base64ImageField(read_only=True)
+    image_variants = ImageVariantsField(
+        'image', 'image_variants', RECIPE_IMAGE_SIZES
+    )
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Сериализатор для чтения рецептов."""
 
     tags = TagsSerializer(many=True, read_only=True)
@@ -105,6 +153,9 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         source='recipe_ingredients', many=True, read_only=True
     )
     image = Base64ImageField(read_only=True)
+    image_variants = ImageVariantsField(
+        'image', 'image_variants', RECIPE_IMAGE_SIZES
+    )
     is_favorited = serializers.BooleanField(read_only=True, default=False)
     is_in_shopping_cart = serializers.BooleanField(
         read_only=True, default=False
@@ -115,18 +166,32 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'tags', 'author', 'ingredients',
             'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text', 'cooking_time'
+            'name', 'image', 'image_variants', 'text', 'cooking_time'
         )
 
 
+class RecipeWrittenSerializer(RecipeReadSerializer):
+    """
+    Ответ на создание и изменение рецепта.
+
+    Теги и ингредиенты берутся из проверенных данных запроса,
+    а не перечитываются из базы.
+    """
+
+    tags = TagsSerializer(source='written_tags', many=True, read_only=True)
+    ingredients = RecipeIngredientReadSerializer(
+        source='written_ingredients', many=True, read_only=True
+    )
+
+
 class RecipeWriteSerializer(serializers.ModelSerializer):
     """Сериализатор для создания и редактирования рецептов."""
 
     ingredients = RecipeIngredientWriteSerializer(many=True, write_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BatchedPrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all()
     )
-    image = Base64ImageField(required=True)
+    image = StreamingBase64ImageField(required=True)
 
     class Meta:
         model = Recipe
@@ -176,40 +241,134 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
         return value
 
+    @transaction.atomic
     def create(self, data, **kwargs):
         tags = data.pop('tags')
         ingredients = data.pop('ingredients')
         recipe = Recipe.objects.create(
             author=self.context.get('request').user, **data
         )
-        recipe.tags.set(tags)
-        self.create_ingredients(recipe, ingredients)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag) for tag in tags
+        )
+        recipe.written_tags = tags
+        recipe.written_ingredients = self.create_ingredients(
+            recipe, ingredients
+        )
         return recipe
 
+    @staticmethod
+    def is_same_file(field_file, new_file):
+        """
+        Совпадает ли загруженный файл с уже сохраненным.
+
+        Сравниваются имена по хешу содержимого, без чтения сохраненного
+        файла. Файлы, сохраненные до перехода на ContentAddressedStorage,
+        считаются другими: повторное сохранение переименует их по хешу.
+        """
+        storage = field_file.storage
+        if not field_file or not isinstance(
+            storage, ContentAddressedStorage
+        ):
+            return False
+        return storage.get_content_name(
+            field_file.name, new_file
+        ) == field_file.name
+
+    @staticmethod
+    def update_tags(instance, tags):
+        if {tag.id for tag in instance.tags.all()} == {tag.id for tag in tags}:
+            return False
+        instance.tags.set(tags)
+        return True
+
+    def update_ingredients(self, instance, ingredients):
+        """
+        Приводит ингредиенты рецепта к переданному списку.
+
+        Изменившиеся количества обновляются одним bulk_update, новые
+        ингредиенты добавляются, лишние удаляются; совпадающие строки
+        не трогаются. Возвращает True, если состав рецепта изменился.
+        """
+        existing = {
+            item.ingredient_id: item
+            for item in instance.recipe_ingredients.all()
+        }
+        old_amounts = {
+            ingredient_id: item.amount
+            for ingredient_id, item in existing.items()
+        }
+        new_amounts = {item['id'].id: item['amount'] for item in ingredients}
+        for item in ingredients:
+            if item['id'].id in existing:
+                existing[item['id'].id].ingredient = item['id']
+        if old_amounts == new_amounts:
+            instance.written_ingredients = [
+                existing[item['id'].id] for item in ingredients
+            ]
+            return False
+        changed = []
+        for ingredient_id, item in existing.items():
+            amount = new_amounts.get(ingredient_id, item.amount)
+            if amount != item.amount:
+                item.amount = amount
+                changed.append(item)
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        RecipeIngredient.objects.filter(pk__in=[
+            item.pk for ingredient_id, item in existing.items()
+            if ingredient_id not in new_amounts
+        ]).delete()
+        created = {
+            item.ingredient_id: item
+            for item in self.create_ingredients(instance, [
+                item for item in ingredients
+                if item['id'].id not in existing
+            ])
+        }
+        instance.written_ingredients = [
+            existing.get(item['id'].id) or created[item['id'].id]
+            for item in ingredients
+        ]
+        # удаленные строки убирает из списков покупок сигнал post_delete
+        update_recipe_in_shopping_lists(instance.id, {
+            ingredient_id: amount
+            for ingredient_id, amount in old_amounts.items()
+            if ingredient_id in new_amounts
+        }, new_amounts)
+        return True
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'ingredients' not in validated_data or 'tags' not in validated_data:
             raise serializers.ValidationError({
                 'Это поле обязательно при обновлении рецепта.'
             })
-        tags = validated_data.pop('tags', None)
-        if tags is not None:
-            instance.tags.set(tags)
-        ingredients_data = validated_data.pop('ingredients', None)
-        if ingredients_data is not None:
-            instance.recipe_ingredients.all().delete()
-            self.create_ingredients(instance, ingredients_data)
-        return super().update(instance, validated_data)
+        instance.written_tags = validated_data.pop('tags')
+        relations_changed = self.update_tags(instance, instance.written_tags)
+        relations_changed |= self.update_ingredients(
+            instance, validated_data.pop('ingredients')
+        )
+        image = validated_data.get('image')
+        if image is not None and self.is_same_file(instance.image, image):
+            del validated_data['image']
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        if changed_fields or relations_changed:
+            for field in changed_fields:
+                setattr(instance, field, validated_data[field])
+            instance.save(update_fields=(*changed_fields, 'updated_at'))
+        return instance
 
     def to_representation(self, instance):
-        return RecipeReadSerializer(instance, context=self.context).data
+        return RecipeWrittenSerializer(instance, context=self.context).data
 
 
 class SubscriptionSerializer(UserDetailSerializer):
     """Сериализатор для вывода информации о подписках."""
 
-    recipes_count = serializers.IntegerField(
-        read_only=True, default=Constants.RECIPES_COUNT
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
     recipes = serializers.SerializerMethodField(read_only=True)
 
     class Meta(UserDetailSerializer.Meta):
@@ -219,72 +378,21 @@ class SubscriptionSerializer(UserDetailSerializer):
         )
 
     def get_recipes(self, obj):
-        try:
-            limit = int(
-                self.context.get('request').query_params.get('recipes_limit')
-            )
-        except (TypeError, ValueError):
-            limit = None
+        prefetch_recent_recipes(
+            (obj,), get_recipes_limit(self.context['request'])
+        )
         return RecipeShortSerializer(
-            obj.recipes.all()[:limit], many=True, context=self.context).data
+            obj.recent_recipes, many=True, context=self.context).data
 
 
-class SubscriptionCreateSerializer(serializers.ModelSerializer):
-    """Сериализатор для создания подписок."""
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id рецептов для массовых операций."""
 
-    class Meta:
-        model = Follow
-        fields = ('author',)
-        read_only_fields = ('user',)
-
-    def validate(self, data):
-        user = self.context['request'].user
-        author = data['author']
-        if user == author:
-            raise serializers.ValidationError(
-                {'detail': 'Нельзя подписаться на самого себя.'}
-            )
-        if Follow.objects.filter(user=user, author=author).exists():
-            raise serializers.ValidationError(
-                {'detail': 'Подписка уже существует.'}
-            )
-        return data
-
-    def to_representation(self, instance):
-        return SubscriptionSerializer(
-            instance.author,
-            context=self.context
-        ).data
-
-
-class ShoppingCartFavoriteBaseSerializer(serializers.ModelSerializer):
-    """Базовый сериализатор для корзины покупок и избранного."""
-
-    def validate(self, data):
-        user = self.context['request'].user
-        recipe = data['recipe']
-        if self.Meta.model.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError({
-                'detail': f'Рецепт уже в {self.Meta.model._meta.verbose_name}'
-            })
-        return data
-
-    def to_representation(self, instance):
-        return RecipeShortSerializer(instance.recipe,
-                                     context=self.context).data
-
-
-class ShoppingCartSerializer(ShoppingCartFavoriteBaseSerializer):
-    """Сериализатор для корзины покупок."""
-
-    class Meta:
-        model = ShoppingCart
-        fields = '__all__'
-
-
-class FavoriteSerializer(ShoppingCartFavoriteBaseSerializer):
-    """Сериализатор для избранного."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=Constants.MAX_BULK_RECIPES,
+    )
 
-    class Meta:
-        model = Favorite
-        fields = '__all__'
+    def validate_recipes(self, recipes):
+        return list(dict.fromkeys(recipes))
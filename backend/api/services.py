@@ -1,10 +1,73 @@
-def generate_shoping_list(ingredients_queryset):
-    """Генерирует текст для списка покупок."""
-    lines = ['Список покупок:\n']
-    for item in ingredients_queryset:
-        lines.append(
-            f'{item["name"]} '
-            f'{item["measurement_unit"]} - '
-            f'{item["total_amount"]}\n'
-        )
-    return ''.join(lines)
+from django.db.models import F, Prefetch, Window, prefetch_related_objects
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from recipes.models import Recipe, ShoppingListItem
+
+SHOPPING_LIST_CHUNK_SIZE = 500
+RECENT_RECIPES_FIELDS = (
+    'id', 'author', 'name', 'image', 'image_variants', 'cooking_time'
+)
+
+
+def get_shopping_list(user):
+    """
+    Итератор по ингредиентам списка покупок пользователя.
+
+    Количества уже просуммированы в ShoppingListItem. Строки читаются
+    из базы порциями (на PostgreSQL — через серверный курсор).
+    """
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .values('total_amount',
+                name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit'))
+        .order_by('name')
+        .iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+    )
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не задан."""
+    try:
+        limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return max(limit, 0)
+
+
+def get_recent_recipes(authors, limit):
+    """
+    Последние limit рецептов каждого из авторов одним запросом.
+
+    Рецепты нумеруются ROW_NUMBER() в окне по автору, и из базы
+    читаются только строки с номером не больше limit, сколько бы
+    рецептов у авторов ни было.
+    """
+    recipes = Recipe.objects.filter(author__in=authors)
+    ordering = ('-pub_date', '-id')
+    if limit is None:
+        return recipes.only(*RECENT_RECIPES_FIELDS).order_by(*ordering)
+    ranked = recipes.annotate(row_number=Window(
+        RowNumber(),
+        partition_by=F('author_id'),
+        order_by=[F(field[1:]).desc() for field in ordering],
+    )).order_by().values('id', 'row_number')
+    sql, params = ranked.query.sql_with_params()
+    return Recipe.objects.filter(pk__in=RawSQL(
+        f'SELECT ranked.id FROM ({sql}) ranked '
+        'WHERE ranked.row_number <= %s',
+        (*params, limit),
+    )).only(*RECENT_RECIPES_FIELDS).order_by(*ordering)
+
+
+def prefetch_recent_recipes(authors, limit):
+    """Кладёт в author.recent_recipes последние limit рецептов автора."""
+    authors = [author for author in authors
+               if not hasattr(author, 'recent_recipes')]
+    if authors:
+        prefetch_related_objects(authors, Prefetch(
+            'recipes',
+            queryset=get_recent_recipes(authors, limit),
+            to_attr='recent_recipes',
+        ))
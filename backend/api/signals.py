@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.cache import (AUTHOR_CACHED_FIELDS, INGREDIENTS_CACHE_NAMESPACE,
+                       RECIPES_CACHE_NAMESPACE, SHOPPING_CART_CACHE_NAMESPACE,
+                       TAGS_CACHE_NAMESPACE, bump_cache_version)
+from recipes.models import (Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+                            Tag)
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes_cache(**kwargs):
+    bump_cache_version(RECIPES_CACHE_NAMESPACE)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags_cache(**kwargs):
+    bump_cache_version(TAGS_CACHE_NAMESPACE)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients_cache(**kwargs):
+    bump_cache_version(INGREDIENTS_CACHE_NAMESPACE)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_shopping_cart_cache(instance, **kwargs):
+    bump_cache_version(SHOPPING_CART_CACHE_NAMESPACE.format(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_recipes_cache_on_author_change(update_fields, **kwargs):
+    if update_fields and set(AUTHOR_CACHED_FIELDS).isdisjoint(update_fields):
+        return
+    bump_cache_version(RECIPES_CACHE_NAMESPACE)
@@ -0,0 +1,89 @@
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_RESIZE_CACHE_ROOT=MEDIA_ROOT,
+    IMAGE_VARIANTS_WORKERS=0,
+)
+class RecipeConditionalRequestTests(TestCase):
+    """ETag рецепта меняется вместе с данными ответа."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Авторов', password='pass',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/test.png',
+        )
+        cls.url = f'/api/recipes/{cls.recipe.pk}/'
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        # ответы авторизованным не кешируются: тело всегда из базы
+        self.client.force_authenticate(self.author)
+
+    def get_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response['ETag']
+
+    def test_not_modified(self):
+        etag = self.get_etag()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_invalid_pk(self):
+        for pk in ('abc', '0', str(self.recipe.pk + 1000)):
+            with self.subTest(pk=pk):
+                response = self.client.get(f'/api/recipes/{pk}/')
+                self.assertEqual(
+                    response.status_code, status.HTTP_404_NOT_FOUND
+                )
+
+    def test_author_changed_elsewhere(self):
+        """
+        update() не отправляет сигналов и не меняет версию данных
+        в кеше — как изменение в другом процессе.
+        """
+        for field, value in (
+            ('first_name', 'Другой'),
+            ('avatar', 'users/avatar.png'),
+        ):
+            with self.subTest(field=field):
+                etag = self.get_etag()
+                User.objects.filter(pk=self.author.pk).update(
+                    **{field: value}
+                )
+                response = self.client.get(
+                    self.url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_anonymous_cache_follows_etag(self):
+        anonymous = APIClient()
+        anonymous.get(self.url)
+        User.objects.filter(pk=self.author.pk).update(first_name='Другой')
+        response = anonymous.get(self.url)
+        self.assertEqual(response.data['author']['first_name'], 'Другой')
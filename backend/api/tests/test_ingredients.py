@@ -0,0 +1,41 @@
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient
+
+MATCHING_COUNT = 60
+
+
+class IngredientSearchTests(TestCase):
+    """Поиск ингредиентов по началу названия."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Мука {index:02}', measurement_unit='г')
+            for index in range(MATCHING_COUNT)
+        )
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+
+    def search(self, **params):
+        response = self.client.get('/api/ingredients/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_all_matches_without_limit(self):
+        self.assertEqual(len(self.search(name='му')), MATCHING_COUNT)
+
+    def test_limit(self):
+        self.assertEqual(len(self.search(name='му', limit=5)), 5)
+        self.assertEqual(
+            len(self.search(name='му', limit=0)), MATCHING_COUNT
+        )
+
+    def test_without_name(self):
+        self.assertEqual(len(self.search()), MATCHING_COUNT + 1)
@@ -0,0 +1,46 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from users.models import User
+
+USERS_COUNT = 3
+ESTIMATE = 12345
+
+
+class PageNumberCountTests(TestCase):
+    """Точное и приблизительное количество в постраничной выдаче."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(username=f'user{index}', email=f'user{index}@example.com',
+                 first_name='Имя', last_name='Фамилия')
+            for index in range(USERS_COUNT)
+        )
+        cls.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', first_name='Имя',
+            last_name='Фамилия', password='pass', is_staff=True,
+        )
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def test_exact_count_by_default(self):
+        with mock.patch(
+            'api.pagination.estimate_count', return_value=ESTIMATE
+        ) as estimate_count:
+            response = self.client.get('/api/users/')
+        estimate_count.assert_not_called()
+        self.assertEqual(response.data['count'], USERS_COUNT + 1)
+
+    def test_approximate_count_on_request(self):
+        with mock.patch(
+            'api.pagination.estimate_count', return_value=ESTIMATE
+        ):
+            response = self.client.get('/api/users/', {'count': 'approx'})
+        self.assertEqual(response.data['count'], ESTIMATE)
@@ -0,0 +1,293 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.relations import insert_user_recipes
+from users.models import Follow, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+PAGE_SIZES = (1, 10, 100)
+AUTHORS_COUNT = max(PAGE_SIZES)
+TAGS_PER_RECIPE = 2
+INGREDIENTS_PER_RECIPE = 3
+# (связь, запросов на добавление, запросов на удаление)
+RELATION_BUDGETS = (
+    ('favorite', 6, 7),
+    ('shopping_cart', 10, 10),
+)
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new('RGB', (10, 10), 'red').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_RESIZE_CACHE_ROOT=MEDIA_ROOT,
+    IMAGE_VARIANTS_WORKERS=0,
+)
+class QueryBudgetTests(TestCase):
+    """
+    Число запросов к базе на эндпоинт не зависит от размера страницы.
+
+    Каждый эндпоинт вызывается со страницами из PAGE_SIZES объектов
+    анонимом и пользователем с токеном, и число запросов на каждом
+    размере должно совпасть с бюджетом. Рост числа запросов с размером
+    страницы означает N+1; если запросов стало меньше, бюджет нужно
+    уменьшить. Бюджеты сняты на SQLite (USE_SQLITE=1): на PostgreSQL
+    пагинатор добавляет запрос EXPLAIN для оценки количества.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # bulk_create на SQLite не возвращает id: объекты перечитываются
+        Tag.objects.bulk_create(
+            Tag(name=f'Тег {index}', slug=f'tag-{index}')
+            for index in range(TAGS_PER_RECIPE)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {index:03}', measurement_unit='г')
+            for index in range(max(PAGE_SIZES))
+        )
+        tags = Tag.objects.all()
+        cls.ingredient_ids = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        ingredients = Ingredient.objects.filter(
+            pk__in=cls.ingredient_ids[:INGREDIENTS_PER_RECIPE]
+        )
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев', password='pass',
+            is_staff=True,
+        )
+        User.objects.bulk_create(
+            User(username=f'author{index}',
+                 email=f'author{index}@example.com',
+                 first_name='Автор', last_name=f'Авторов{index}')
+            for index in range(AUTHORS_COUNT)
+        )
+        authors = User.objects.exclude(pk=cls.user.pk)
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {index}',
+                   text='Описание', cooking_time=10,
+                   image='recipes/test.png')
+            for index, author in enumerate(authors)
+        )
+        recipes = Recipe.objects.order_by('pk')
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for recipe in recipes for ingredient in ingredients
+        )
+        Follow.objects.bulk_create(
+            Follow(user=cls.user, author=author) for author in authors
+        )
+        cls.recipe_ids = [recipe.pk for recipe in recipes]
+        cls.tag_ids = [tag.pk for tag in tags]
+        cls.author = User.objects.create_user(
+            username='newauthor', email='newauthor@example.com',
+            first_name='Автор', last_name='Новый', password='pass',
+        )
+        insert_user_recipes(Favorite, cls.user, cls.recipe_ids[::2])
+        cls.token = Token.objects.create(user=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # ответы анонимам кешируются: каждый запрос должен дойти до базы
+        caches['responses'].clear()
+        self.anonymous = APIClient()
+        self.authorized = APIClient()
+        self.authorized.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def request(self, client, method, url, data=None):
+        response = getattr(client, method)(url, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.assertLess(
+            response.status_code, status.HTTP_400_BAD_REQUEST,
+            f'{method.upper()} {url}: {response.status_code}'
+        )
+        return response
+
+    def assertQueryBudget(self, budget, client, method, url, data=None):
+        with self.assertNumQueries(budget):
+            return self.request(client, method, url, data)
+
+    def assertClientsBudget(self, anonymous_budget, authorized_budget, url):
+        self.assertQueryBudget(anonymous_budget, self.anonymous, 'get', url)
+        self.assertQueryBudget(authorized_budget, self.authorized, 'get', url)
+
+    def assertPageSizeBudget(self, budget, client, url, page_size=True):
+        """Одно и то же число запросов на всех размерах страницы."""
+        for size in PAGE_SIZES:
+            with self.subTest(url=url, size=size):
+                response = self.assertQueryBudget(
+                    budget, client, 'get', url.format(size=size)
+                )
+                if page_size:
+                    self.assertEqual(len(response.data['results']), size)
+
+    def test_recipe_list(self):
+        url = '/api/recipes/?limit={size}'
+        self.assertPageSizeBudget(4, self.anonymous, url)
+        self.assertPageSizeBudget(6, self.authorized, url)
+
+    def test_recipe_list_cursor(self):
+        url = '/api/recipes/?limit={size}&cursor='
+        self.assertPageSizeBudget(3, self.anonymous, url)
+        self.assertPageSizeBudget(5, self.authorized, url)
+
+    def test_recipe_detail(self):
+        url = f'/api/recipes/{self.recipe_ids[0]}/'
+        self.assertQueryBudget(4, self.anonymous, 'get', url)
+        self.assertQueryBudget(6, self.authorized, 'get', url)
+
+    def test_user_list(self):
+        url = '/api/users/?limit={size}'
+        # HIDE_USERS djoser: аноним получает пустой список, а полные
+        # страницы видит только персонал
+        self.assertPageSizeBudget(1, self.anonymous, url, page_size=False)
+        self.assertPageSizeBudget(3, self.authorized, url)
+
+    def test_user_me(self):
+        self.assertQueryBudget(1, self.authorized, 'get', '/api/users/me/')
+
+    def test_subscriptions(self):
+        self.assertPageSizeBudget(
+            4, self.authorized,
+            '/api/users/subscriptions/?limit={size}&recipes_limit=3'
+        )
+
+    def test_download_shopping_cart(self):
+        for size in PAGE_SIZES:
+            with self.subTest(size=size):
+                ShoppingCart.objects.filter(user=self.user).delete()
+                insert_user_recipes(
+                    ShoppingCart, self.user, self.recipe_ids[:size]
+                )
+                self.assertQueryBudget(
+                    3, self.authorized, 'get',
+                    '/api/recipes/download_shopping_cart/?format=txt'
+                )
+
+    def test_relations(self):
+        url = '/api/recipes/{id}/{relation}/'
+        for relation, post_budget, delete_budget in RELATION_BUDGETS:
+            with self.subTest(relation=relation):
+                relation_url = url.format(
+                    id=self.recipe_ids[1], relation=relation
+                )
+                self.assertQueryBudget(
+                    post_budget, self.authorized, 'post', relation_url
+                )
+                self.assertQueryBudget(
+                    delete_budget, self.authorized, 'delete', relation_url
+                )
+
+    def test_bulk_relations(self):
+        for relation, post_budget, delete_budget in RELATION_BUDGETS:
+            url = f'/api/recipes/{relation}/'
+            for size in PAGE_SIZES:
+                with self.subTest(relation=relation, size=size):
+                    data = {'recipes': self.recipe_ids[-size:]}
+                    self.assertQueryBudget(
+                        post_budget, self.authorized, 'post', url, data
+                    )
+                    self.assertQueryBudget(
+                        delete_budget, self.authorized, 'delete', url, data
+                    )
+
+    def test_tags(self):
+        self.assertClientsBudget(2, 3, '/api/tags/')
+        self.assertClientsBudget(2, 3, f'/api/tags/{self.tag_ids[0]}/')
+
+    def test_ingredients(self):
+        self.assertClientsBudget(2, 3, '/api/ingredients/')
+        self.assertClientsBudget(
+            2, 3, f'/api/ingredients/{self.ingredient_ids[0]}/'
+        )
+        # первый поиск строит индекс в памяти, следующие его только читают
+        self.request(self.anonymous, 'get', '/api/ingredients/?name=и')
+        for size in PAGE_SIZES:
+            with self.subTest(size=size):
+                url = f'/api/ingredients/?name=ингредиент&limit={size}'
+                self.assertEqual(len(self.assertQueryBudget(
+                    1, self.anonymous, 'get', url
+                ).data), size)
+                self.assertQueryBudget(2, self.authorized, 'get', url)
+
+    def test_user_detail(self):
+        self.assertClientsBudget(1, 2, f'/api/users/{self.author.pk}/')
+
+    def test_subscribe(self):
+        url = f'/api/users/{self.author.pk}/subscribe/?recipes_limit=3'
+        self.assertQueryBudget(7, self.authorized, 'post', url)
+        self.assertQueryBudget(7, self.authorized, 'delete', url)
+
+    def test_avatar(self):
+        url = '/api/users/me/avatar/'
+        self.assertQueryBudget(
+            2, self.authorized, 'put', url, {'avatar': make_image()}
+        )
+        self.assertQueryBudget(2, self.authorized, 'delete', url)
+
+    def test_short_link(self):
+        self.assertClientsBudget(
+            1, 2, f'/api/recipes/{self.recipe_ids[0]}/get-link/'
+        )
+
+    def get_recipe_data(self, ingredients_count, amount):
+        return {
+            'name': 'Новый рецепт', 'text': 'Описание', 'cooking_time': 5,
+            'image': make_image(), 'tags': self.tag_ids,
+            'ingredients': [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id in self.ingredient_ids[:ingredients_count]
+            ],
+        }
+
+    def test_recipe_write(self):
+        """Запись рецепта с числом ингредиентов из PAGE_SIZES."""
+        for size in PAGE_SIZES:
+            with self.subTest(size=size):
+                recipe_id = self.assertQueryBudget(
+                    11, self.authorized, 'post', '/api/recipes/',
+                    self.get_recipe_data(size, 10)
+                ).data['id']
+                url = f'/api/recipes/{recipe_id}/'
+                self.assertQueryBudget(
+                    12, self.authorized, 'patch', url,
+                    self.get_recipe_data(size, 20)
+                )
+                self.assertQueryBudget(20, self.authorized, 'delete', url)
+
+    def test_auth_token(self):
+        client = APIClient()
+        token = self.assertQueryBudget(
+            6, client, 'post', '/api/auth/token/login/',
+            {'email': 'newauthor@example.com', 'password': 'pass'}
+        ).data['auth_token']
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertQueryBudget(2, client, 'post', '/api/auth/token/logout/')
@@ -0,0 +1,98 @@
+import json
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+from recipes.relations import insert_user_recipes
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+URL = '/api/recipes/download_shopping_cart/'
+FORMATS = ('txt', 'csv', 'json', 'md')
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_RESIZE_CACHE_ROOT=MEDIA_ROOT,
+    IMAGE_VARIANTS_WORKERS=0,
+)
+class DownloadShoppingCartTests(TestCase):
+    """Выгрузка списка покупок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Блины', text='Описание',
+            cooking_time=10, image='recipes/test.png',
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredient, amount=200
+        )
+        insert_user_recipes(ShoppingCart, cls.user, (cls.recipe.pk,))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, client, file_format):
+        response = client.get(URL, {'format': file_format})
+        content = (
+            b''.join(response.streaming_content) if response.streaming
+            else response.content
+        )
+        return response, content
+
+    def test_errors_are_json(self):
+        for file_format in FORMATS:
+            with self.subTest(format=file_format):
+                response, content = self.download(APIClient(), file_format)
+                self.assertEqual(
+                    response.status_code, status.HTTP_401_UNAUTHORIZED
+                )
+                self.assertTrue(
+                    response['Content-Type'].startswith('application/json')
+                )
+                self.assertIn('detail', json.loads(content))
+
+    def test_cached_download(self):
+        for file_format in FORMATS:
+            with self.subTest(format=file_format):
+                first, first_content = self.download(self.client, file_format)
+                self.assertTrue(first.streaming)
+                self.assertIn('Мука'.encode(), first_content)
+                second, second_content = self.download(
+                    self.client, file_format
+                )
+                self.assertFalse(second.streaming)
+                self.assertEqual(second_content, first_content)
+                self.assertEqual(
+                    int(second['Content-Length']), len(first_content)
+                )
+                self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_cache_follows_changes(self):
+        _, content = self.download(self.client, 'txt')
+        ingredient = RecipeIngredient.objects.get(recipe=self.recipe)
+        ingredient.amount = 300
+        ingredient.save()
+        _, changed = self.download(self.client, 'txt')
+        self.assertNotEqual(changed, content)
+        self.assertIn(b'300', changed)
@@ -0,0 +1,85 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.serializers import RecipeReadSerializer
+from recipes.models import Ingredient, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new('RGB', (10, 10), 'red').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_RESIZE_CACHE_ROOT=MEDIA_ROOT,
+    IMAGE_VARIANTS_WORKERS=0,
+)
+class SparseFieldsetTests(TestCase):
+    """Параметры fields и omit действуют только на чтение."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cook', email='cook@example.com',
+            first_name='Повар', last_name='Поваров', password='pass',
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, url='/api/recipes/'):
+        return self.client.post(url, {
+            'name': 'Блины', 'text': 'Описание', 'cooking_time': 10,
+            'image': make_image(), 'tags': [self.tag.pk],
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 200}],
+        }, format='json')
+
+    def test_read_is_sparse(self):
+        recipe_id = self.create_recipe().data['id']
+        response = self.client.get(
+            f'/api/recipes/{recipe_id}/', {'fields': 'id,name'}
+        )
+        self.assertEqual(set(response.data), {'id', 'name'})
+
+    def test_write_response_is_full(self):
+        response = self.create_recipe('/api/recipes/?fields=id&omit=tags')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            set(response.data), set(RecipeReadSerializer.Meta.fields)
+        )
+        response = self.client.patch(
+            f'/api/recipes/{response.data["id"]}/?fields=id',
+            {'name': 'Оладьи', 'tags': [self.tag.pk],
+             'ingredients': [{'id': self.ingredient.pk, 'amount': 100}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data), set(RecipeReadSerializer.Meta.fields)
+        )
@@ -1,40 +1,112 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Exists, F, OuterRef, Sum
-from django.http import FileResponse
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import (Count, Exists, F, Max, OuterRef, Prefetch, Sum,
+                              Value)
+from django.http import HttpResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.utils.http import int_to_base36
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserViewSet
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from api.filters import RecipesFilter
+from api.cache import (AUTHOR_CACHED_FIELDS, INGREDIENTS_CACHE_NAMESPACE,
+                       RECIPES_CACHE_NAMESPACE, SHOPPING_CART_CACHE_NAMESPACE,
+                       TAGS_CACHE_NAMESPACE, bump_cache_version,
+                       cache_anonymous_response, cache_stream,
+                       conditional_response, get_data_version,
+                       get_queryset_marker, make_etag, response_cache)
+from api.filters import IngredientPrefixFilter, RecipesFilter
+from api.pagination import RecipeCursorPagination
+from api.parsers import Base64JSONParser
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (AvatarSerializer, FavoriteSerializer,
-                             IngredientsSerializer, RecipeReadSerializer,
-                             RecipeWriteSerializer, ShoppingCartSerializer,
-                             SubscriptionCreateSerializer,
+from api.renderers import (ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+                           ShoppingListMarkdownRenderer, ShoppingListRenderer,
+                           ShoppingListTextRenderer)
+from api.serializers import (AvatarSerializer, IngredientsSerializer,
+                             RecipeIdsSerializer, RecipeReadSerializer,
+                             RecipeShortSerializer, RecipeWriteSerializer,
                              SubscriptionSerializer, TagsSerializer,
                              UserDetailSerializer)
-from api.services import generate_shoping_list
+from api.services import (get_recipes_limit, get_shopping_list,
+                          prefetch_recent_recipes)
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.relations import (add_user_recipes, delete_recipes,
+                               delete_user_recipes, follow_author,
+                               insert_user_recipes, remove_user_recipes)
 from users.models import Follow
 
 User = get_user_model()
 
 
+USER_MODEL_FIELDS = (
+    'email', 'username', 'first_name', 'last_name', 'avatar',
+    'avatar_variants', 'recipes_count'
+)
+# самый большой список покупок, который кешируется целиком, байт
+SHOPPING_LIST_CACHE_MAX_SIZE = 256 * 1024
+RECIPE_DEFERRABLE_FIELDS = (
+    'name', 'image', 'image_variants', 'text', 'cooking_time'
+)
+# поле ответа: поля модели, без которых его не построить
+FIELD_DEPENDENCIES = {
+    'image_variants': ('image',),
+    'avatar_variants': ('avatar',),
+}
+
+
+def with_dependencies(fields):
+    return fields.union(*(
+        FIELD_DEPENDENCIES.get(field, ()) for field in fields
+    ))
+
+
+def annotate_is_subscribed(queryset, user):
+    """Добавляет к выборке авторов признак подписки текущего пользователя."""
+    if not user.is_authenticated:
+        return queryset
+    return queryset.annotate(is_subscribed=Exists(
+        Follow.objects.filter(user=user, author=OuterRef('pk'))
+    ))
+
+
+def shape_users_queryset(queryset, user, fields):
+    """Загружает из базы только поля пользователя, попавшие в ответ."""
+    loaded = with_dependencies(fields)
+    queryset = queryset.only(
+        'id', *(field for field in USER_MODEL_FIELDS if field in loaded)
+    )
+    if 'is_subscribed' in fields:
+        queryset = annotate_is_subscribed(queryset, user)
+    return queryset
+
+
 class UserViewSet(DjoserViewSet):
     """Вьюсет для объектов пользователя."""
 
-    queryset = User.objects.all().prefetch_related('recipes')
+    queryset = User.objects.all()
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter)
     search_fields = ('username',)
     lookup_field = 'id'
     http_method_names = ('get', 'post', 'put', 'delete', 'head', 'options')
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return annotate_is_subscribed(queryset, self.request.user)
+        return shape_users_queryset(
+            queryset,
+            self.request.user,
+            UserDetailSerializer.get_requested_fields(self.request)
+        )
+
     @action(
         detail=False,
         methods=('get',),
@@ -52,6 +124,7 @@ class UserViewSet(DjoserViewSet):
         methods=('put',),
         url_path='me/avatar',
         permission_classes=(permissions.IsAuthenticated,),
+        parser_classes=(Base64JSONParser, FormParser, MultiPartParser),
     )
     def avatar(self, request):
         serializer = AvatarSerializer(
@@ -62,7 +135,10 @@ class UserViewSet(DjoserViewSet):
 
     @avatar.mapping.delete
     def delete_avatar(self, request):
-        request.user.avatar.delete()
+        # файл может использоваться другими объектами, его удалит
+        # collect_media_garbage
+        request.user.avatar = None
+        request.user.save(update_fields=('avatar',))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -70,21 +146,25 @@ class UserViewSet(DjoserViewSet):
         detail=True,
         url_path='subscribe',
         permission_classes=(permissions.IsAuthenticated,),
-        serializer_class=SubscriptionCreateSerializer
+        serializer_class=SubscriptionSerializer
     )
+    @transaction.atomic
     def subscribe(self, request, id=None):
-        author = get_object_or_404(
-            User.objects.prefetch_related('recipes'), pk=id
-        )
-        serializer = SubscriptionCreateSerializer(
-            data={'author': author.id},
-            context={'request': request}
+        author = get_object_or_404(User, pk=id)
+        if author == request.user:
+            raise ValidationError(
+                {'detail': ['Нельзя подписаться на самого себя.']}
+            )
+        if not follow_author(request.user, author):
+            raise ValidationError({'detail': ['Подписка уже существует.']})
+        author.is_subscribed = True
+        return Response(
+            SubscriptionSerializer(author, context={'request': request}).data,
+            status=status.HTTP_201_CREATED
         )
-        serializer.is_valid(raise_exception=True)
-        serializer.save(user=self.request.user)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
+    @transaction.atomic
     def unsubscribe(self, request, id=None):
         author = get_object_or_404(User, pk=id)
         deleted, _ = Follow.objects.filter(
@@ -104,34 +184,62 @@ class UserViewSet(DjoserViewSet):
         serializer_class=SubscriptionSerializer
     )
     def subscriptions(self, request):
-        subscribed_authors_qs = (
-            User.objects.filter(subscriptions_to_author__user=request.user)
-            .annotate(recipes_count=Count('recipes'))
-            .order_by('username').prefetch_related('recipes')
-        )
+        fields = SubscriptionSerializer.get_requested_fields(request)
+        subscribed_authors_qs = shape_users_queryset(
+            User.objects.filter(subscriptions_to_author__user=request.user),
+            request.user,
+            fields - {'is_subscribed'}
+        ).order_by('username')
+        if 'is_subscribed' in fields:
+            subscribed_authors_qs = subscribed_authors_qs.annotate(
+                is_subscribed=Value(True)
+            )
         page = self.paginate_queryset(subscribed_authors_qs)
-        serializer = self.get_serializer(
-            page if page is not None else subscribed_authors_qs, many=True
-        )
+        authors = page if page is not None else list(subscribed_authors_qs)
+        if 'recipes' in fields:
+            prefetch_recent_recipes(authors, get_recipes_limit(request))
+        serializer = self.get_serializer(authors, many=True)
         return self.get_paginated_response(serializer.data)
 
 
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+class CatalogViewSet(viewsets.ReadOnlyModelViewSet):
+    """Базовый вьюсет справочников с поддержкой условных запросов."""
+
+    pagination_class = None
+    cache_namespace = None
+
+    def get_validators(self, request, *args, **kwargs):
+        return make_etag(
+            self.cache_namespace,
+            get_data_version(self.cache_namespace),
+            *get_queryset_marker(self.queryset),
+            request.get_full_path(),
+        ), None
+
+    @conditional_response(get_validators, max_age=settings.CATALOG_MAX_AGE)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response(get_validators, max_age=settings.CATALOG_MAX_AGE)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class TagsViewSet(CatalogViewSet):
     """Вьюсет для тегов."""
 
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
-    pagination_class = None
+    cache_namespace = TAGS_CACHE_NAMESPACE
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(CatalogViewSet):
     """Вьюсет для тегов."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientsSerializer
-    pagination_class = None
-    filter_backends = (filters.SearchFilter,)
-    search_fields = ('^name',)
+    filter_backends = (IngredientPrefixFilter,)
+    cache_namespace = INGREDIENTS_CACHE_NAMESPACE
 
 
 class RecipesViewSet(viewsets.ModelViewSet):
@@ -140,23 +248,127 @@ class RecipesViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipesFilter
     permission_classes = (IsAuthorOrReadOnly,)
+    parser_classes = (Base64JSONParser, FormParser, MultiPartParser)
+
+    @property
+    def paginator(self):
+        if (
+            self.action == 'list'
+            and RecipeCursorPagination.cursor_query_param
+            in self.request.query_params
+        ):
+            self.pagination_class = RecipeCursorPagination
+        return super().paginator
+
+    def get_requested_fields(self):
+        if self.action == 'get_short_link':
+            return frozenset(('id',))
+        if self.request.method not in permissions.SAFE_METHODS:
+            return frozenset(RecipeReadSerializer.Meta.fields)
+        return RecipeReadSerializer.get_requested_fields(self.request)
 
     def get_queryset(self):
         user = self.request.user
-        queryset = (
-            Recipe.objects.select_related('author')
-            .prefetch_related('tags', 'ingredients')
+        fields = self.get_requested_fields()
+        queryset = Recipe.objects.all()
+        if self.request.method in permissions.SAFE_METHODS:
+            loaded = with_dependencies(fields)
+            queryset = queryset.defer('search_vector', *(
+                field for field in RECIPE_DEFERRABLE_FIELDS
+                if field not in loaded
+            ))
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ))
+        if not user.is_authenticated:
+            if 'author' in fields:
+                queryset = queryset.select_related('author')
+            return queryset
+        if 'author' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'author',
+                queryset=annotate_is_subscribed(User.objects.all(), user)
+            ))
+        relations = self.get_user_relations(user)
+        return queryset.annotate(**{
+            name: relation for name, relation in relations.items()
+            if name in fields
+        }).order_by(*(
+            (F(name) if name in fields else relation).desc()
+            for name, relation in relations.items()
+        ))
+
+    @staticmethod
+    def get_user_relations(user):
+        return {
+            'is_favorited': Exists(Favorite.objects.filter(
+                recipe=OuterRef('pk'), user=user
+            )),
+            'is_in_shopping_cart': Exists(ShoppingCart.objects.filter(
+                recipe=OuterRef('pk'), user=user
+            )),
+        }
+
+    @classmethod
+    def annotate_user_relations(cls, queryset, user):
+        return queryset.annotate(**cls.get_user_relations(user))
+
+    def get_validators(self, request, pk=None):
+        """
+        ETag рецепта из состояния в базе: рецепта, его автора и связей
+        с пользователем.
+
+        Автора могут изменить в другом процессе, где сигнал не сбросит
+        версию локального кеша, поэтому его поля входят в ETag напрямую.
+        Last-Modified не отдается: дата изменения рецепта не меняется
+        при изменении автора.
+        """
+        user = request.user
+        queryset = Recipe.objects.select_related('author').only(
+            'updated_at', 'image_variants', 'author_id', *(
+                f'author__{field}' for field in AUTHOR_CACHED_FIELDS
+            )
         )
         if user.is_authenticated:
-            return queryset.annotate(
-                is_favorited=Exists(Favorite.objects.filter(
-                    recipe=OuterRef('pk'), user=user
-                )),
-                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
-                    recipe=OuterRef('pk'), user=user
-                )),
-            ).order_by('-is_favorited', '-is_in_shopping_cart')
-        return queryset
+            queryset = self.annotate_user_relations(queryset, user).annotate(
+                is_subscribed=Exists(Follow.objects.filter(
+                    user=user, author=OuterRef('author')
+                ))
+            )
+        recipe = get_object_or_404(queryset, pk=pk)
+        return make_etag(
+            RECIPES_CACHE_NAMESPACE,
+            get_data_version(RECIPES_CACHE_NAMESPACE),
+            recipe.pk,
+            ','.join(sorted(self.get_requested_fields())),
+            recipe.updated_at.isoformat(),
+            recipe.image_variants,
+            *(
+                getattr(recipe.author, field)
+                for field in AUTHOR_CACHED_FIELDS
+            ),
+            user.pk,
+            getattr(recipe, 'is_favorited', False),
+            getattr(recipe, 'is_in_shopping_cart', False),
+            getattr(recipe, 'is_subscribed', False),
+        ), None
+
+    @cache_anonymous_response(RECIPES_CACHE_NAMESPACE)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response(get_validators, per_user=True)
+    @cache_anonymous_response(RECIPES_CACHE_NAMESPACE)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        delete_recipes((instance.pk,))
 
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
@@ -175,45 +387,118 @@ class RecipesViewSet(viewsets.ModelViewSet):
                         args=[int_to_base36(self.get_object().id)]))
         })
 
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if getattr(response, 'exception', False) and isinstance(
+            getattr(response, 'accepted_renderer', None),
+            ShoppingListRenderer
+        ):
+            # ошибки (401, 404) — словари, рендереры списка покупок
+            # их не строят
+            response.accepted_renderer = JSONRenderer()
+            response.accepted_media_type = JSONRenderer.media_type
+        return response
+
+    def get_shopping_list_validators(self, request):
+        user = request.user
+        marker = ShoppingListItem.objects.filter(user=user).aggregate(
+            count=Count('pk'), updated_at=Max('updated_at'),
+            total=Sum('total_amount'),
+        )
+        return make_etag(
+            request.accepted_renderer.format,
+            user.pk,
+            get_data_version(SHOPPING_CART_CACHE_NAMESPACE.format(user.pk)),
+            get_data_version(INGREDIENTS_CACHE_NAMESPACE),
+            marker['count'],
+            marker['updated_at'],
+            marker['total'],
+        ), None
+
     @action(
         detail=False,
         methods=('get',),
         url_path='download_shopping_cart',
         permission_classes=(permissions.IsAuthenticated,),
-        pagination_class=None
+        pagination_class=None,
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+            ShoppingListMarkdownRenderer,
+        ),
     )
+    @conditional_response(get_shopping_list_validators, per_user=True)
     def download_shopping_cart(self, request):
-        ingredients = (
-            RecipeIngredient.objects
-            .filter(recipe__shopping_carts__user=request.user)
-            .values(name=F('ingredient__name'),
-                    measurement_unit=F('ingredient__measurement_unit'))
-            .annotate(total_amount=Sum('amount')).order_by('name')
-        )
-        text_content = generate_shoping_list(ingredients)
-        return FileResponse(
-            text_content, as_attachment=True, filename='shopping_list.txt',
-            content_type='text/plain; charset=utf-8'
+        """
+        Список покупок в формате txt, csv, json или md.
+
+        Документ строится потоком, без сборки в памяти. Небольшие списки
+        (до SHOPPING_LIST_CACHE_MAX_SIZE байт) сохраняются в кеш по ETag
+        и повторно отдаются целиком, с Content-Length.
+        """
+        renderer = request.accepted_renderer
+        content_type = f'{renderer.media_type}; charset={renderer.charset}'
+        key = f'shopping_list:{request.etag}'
+        content = response_cache.get(key)
+        if content is not None:
+            response = HttpResponse(content, content_type=content_type)
+            response['Content-Length'] = len(content)
+        else:
+            response = StreamingHttpResponse(cache_stream(
+                key, renderer.stream(get_shopping_list(request.user)),
+                SHOPPING_LIST_CACHE_MAX_SIZE
+            ), content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
         )
+        return response
 
-    def create_relation(self, request, serializer_cls, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        data = {'user': request.user.id, 'recipe': recipe.id}
-        serializer = serializer_cls(data=data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    @transaction.atomic
+    def create_relation(self, request, model, pk):
+        recipe = get_object_or_404(
+            Recipe.objects.only(*RecipeShortSerializer.Meta.fields), pk=pk
+        )
+        if not insert_user_recipes(model, request.user, (recipe.pk,)):
+            raise ValidationError(
+                {'detail': [f'Рецепт уже в {model._meta.verbose_name}']}
+            )
+        if model is ShoppingCart:
+            bump_cache_version(
+                SHOPPING_CART_CACHE_NAMESPACE.format(request.user.pk)
+            )
+        return Response(
+            RecipeShortSerializer(recipe, context={'request': request}).data,
+            status=status.HTTP_201_CREATED
+        )
 
+    @transaction.atomic
     def delete_relation(self, request, model, pk):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        deleted, _ = model.objects.filter(
-            user=request.user, recipe=recipe
-        ).delete()
+        recipe = get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        deleted = delete_user_recipes(model, request.user, (recipe.pk,))
         return Response(
             status=status.HTTP_204_NO_CONTENT
             if deleted else status.HTTP_400_BAD_REQUEST
         )
 
+    @transaction.atomic
+    def bulk_change_relations(self, request, model, change):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        statuses, changed = change(
+            model, request.user, serializer.validated_data['recipes']
+        )
+        if changed and model is ShoppingCart:
+            bump_cache_version(
+                SHOPPING_CART_CACHE_NAMESPACE.format(request.user.pk)
+            )
+        return Response([
+            {'id': recipe_id, 'status': recipe_status}
+            for recipe_id, recipe_status in statuses.items()
+        ])
+
     @action(
         detail=True,
         methods=('post',),
@@ -221,7 +506,7 @@ class RecipesViewSet(viewsets.ModelViewSet):
         permission_classes=(permissions.IsAuthenticated,),
     )
     def shopping_cart(self, request, pk=None):
-        return self.create_relation(request, ShoppingCartSerializer, pk)
+        return self.create_relation(request, ShoppingCart, pk)
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk=None):
@@ -234,8 +519,40 @@ class RecipesViewSet(viewsets.ModelViewSet):
         permission_classes=(permissions.IsAuthenticated,),
     )
     def favorite(self, request, pk=None):
-        return self.create_relation(request, FavoriteSerializer, pk)
+        return self.create_relation(request, Favorite, pk)
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk=None):
         return self.delete_relation(request, Favorite, pk)
+
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='shopping_cart',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def bulk_shopping_cart(self, request):
+        return self.bulk_change_relations(
+            request, ShoppingCart, add_user_recipes
+        )
+
+    @bulk_shopping_cart.mapping.delete
+    def bulk_delete_shopping_cart(self, request):
+        return self.bulk_change_relations(
+            request, ShoppingCart, remove_user_recipes
+        )
+
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='favorite',
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def bulk_favorite(self, request):
+        return self.bulk_change_relations(request, Favorite, add_user_recipes)
+
+    @bulk_favorite.mapping.delete
+    def bulk_delete_favorite(self, request):
+        return self.bulk_change_relations(
+            request, Favorite, remove_user_recipes
+        )
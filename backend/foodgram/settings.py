@@ -74,6 +74,29 @@ DATABASES = {
         }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.getenv(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
+CATALOG_MAX_AGE = int(os.getenv('CATALOG_MAX_AGE', 60))
+
+ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ESTIMATED_COUNT_THRESHOLD', 10000))
+
+IMAGE_VARIANTS_WORKERS = int(os.getenv('IMAGE_VARIANTS_WORKERS', 2))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -107,6 +130,16 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+IMAGE_RESIZE_CACHE_ROOT = os.getenv(
+    'IMAGE_RESIZE_CACHE_ROOT', os.path.join(MEDIA_ROOT, 'resized')
+)
+
+IMAGE_RESIZE_CACHE_MAX_SIZE = int(
+    os.getenv('IMAGE_RESIZE_CACHE_MAX_SIZE', 512 * 1024 * 1024)
+)
+
+IMAGE_RESIZE_ACCEL_PREFIX = os.getenv('IMAGE_RESIZE_ACCEL_PREFIX', '')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
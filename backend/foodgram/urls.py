@@ -3,13 +3,15 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
-from recipes.views import short_link_redirect
+from recipes.views import resized_image, short_link_redirect
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('s/<str:short_link_id>/',
          short_link_redirect, name='short_link-redirect'),
+    path('media/r/<int:width>x<int:height>/<path:path>',
+         resized_image, name='resized_image'),
 ]
 
 if settings.DEBUG:
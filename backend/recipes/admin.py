@@ -1,8 +1,14 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Prefetch
 from django.utils.safestring import mark_safe
 
+from api.pagination import EstimatedCountPaginator
+from recipes.admin_filters import (AutocompleteFilterMixin,
+                                   AutocompleteListFilter)
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
+from recipes.relations import delete_recipes
 
 
 class RecipeNameMixin:
@@ -18,21 +24,47 @@ class RecipeIngredientInline(admin.TabularInline):
 
     model = RecipeIngredient
     fields = ('ingredient', 'amount')
+    autocomplete_fields = ('ingredient',)
     extra = 0
     min_num = 1
     validate_min = True
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     """Административный интерфейс для управления рецептами."""
 
     list_display = ('id', 'author', 'name', 'get_tags', 'favorites_count',
                     'get_ingredients', 'image_preview', 'cooking_time',
                     'pub_date')
     search_fields = ('author__username', 'name', 'text')
-    list_filter = ('tags', 'author')
+    list_filter = (
+        ('tags', AutocompleteListFilter),
+        ('author', AutocompleteListFilter),
+    )
+    autocomplete_fields = ('author',)
     inlines = (RecipeIngredientInline, )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        delete_recipes((obj.pk,))
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        delete_recipes(queryset.values_list('pk', flat=True))
 
     @admin.display(description='Изображение')
     def image_preview(self, obj):
@@ -51,10 +83,6 @@ class RecipeAdmin(admin.ModelAdmin):
             for ri in obj.recipe_ingredients.all()
         )
 
-    @admin.display(description='Количество добавлений в избранное')
-    def favorites_count(self, obj):
-        return obj.favorites.count()
-
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -75,18 +103,28 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(RecipeNameMixin, admin.ModelAdmin):
+class FavoriteAdmin(RecipeNameMixin, AutocompleteFilterMixin,
+                    admin.ModelAdmin):
     """Административный интерфейс для управления избранным."""
 
     list_display = ('id', 'user', 'display_recipe')
-    list_filter = ('user',)
+    list_filter = (('user', AutocompleteListFilter),)
+    list_select_related = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(RecipeNameMixin, admin.ModelAdmin):
+class ShoppingCartAdmin(RecipeNameMixin, AutocompleteFilterMixin,
+                        admin.ModelAdmin):
     """Административный интерфейс для управления покупками."""
 
     list_display = ('id', 'user', 'display_recipe')
-    list_filter = ('user',)
+    list_filter = (('user', AutocompleteListFilter),)
+    list_select_related = ('user', 'recipe')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
@@ -0,0 +1,68 @@
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class AutocompleteListFilter(admin.RelatedFieldListFilter):
+    """
+    Фильтр по связанному объекту с поиском через автодополнение.
+
+    В отличие от стандартного фильтра не выводит в боковую панель все
+    объекты связанной таблицы: варианты подгружаются по мере ввода
+    из autocomplete-представления админки.
+    """
+
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.model_admin = model_admin
+        super().__init__(field, request, params, model, model_admin,
+                         field_path)
+
+    def field_choices(self, field, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        self.filter_url = changelist.get_query_string(
+            remove=self.expected_parameters()
+        )
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': self.filter_url,
+            'display': 'Все',
+        }
+
+    def widget(self):
+        form_field = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(
+                self.field, self.model_admin.admin_site,
+                attrs={
+                    'class': 'autocomplete-filter',
+                    'data-filter-url': self.filter_url,
+                    'data-filter-param': self.lookup_kwarg,
+                    'style': 'width: 100%',
+                }
+            ),
+        )
+        return form_field.widget.render(self.lookup_kwarg, self.lookup_val)
+
+
+class AutocompleteFilterMixin:
+    """Подключает к списку объектов скрипты фильтров с автодополнением."""
+
+    @property
+    def media(self):
+        return (
+            super().media
+            + AutocompleteSelect(None, self.admin_site).media
+            + forms.Media(js=(
+                'admin/js/jquery.init.js',
+                'recipes/js/autocomplete_filter.js',
+            ))
+        )
@@ -7,5 +7,6 @@ class Constants:
     MAX_TAG_NAME_LENGTH = 32
     MAX_INGREDIENT_NAME_LENGTH = 128
     MAX_INGREDIENT_MEASUREMENT_LENGTH = 64
-    RECIPES_COUNT = 0
     MAX_TIME = 1500
+    INGREDIENTS_SEARCH_LIMIT = 50
+    MAX_BULK_RECIPES = 100
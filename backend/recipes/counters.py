@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow
+
+User = get_user_model()
+
+# (модель со счетчиком, поле счетчика, связанная модель, поле связи)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счетчик объекта на delta, не опуская ниже нуля."""
+    change_counters(model, (pk,), field, delta)
+
+
+def change_counters(model, pks, field, delta):
+    """Изменяет счетчик сразу у нескольких объектов одним запросом."""
+    if pks:
+        model.objects.filter(pk__in=pks).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
+
+
+def count_related(related_model, related_field):
+    """Подзапрос с количеством связанных объектов."""
+    return Coalesce(Subquery(
+        related_model.objects.filter(**{related_field: OuterRef('pk')})
+        .order_by().values(related_field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def reconcile_counters(batch_size, fix=True):
+    """
+    Находит и исправляет расхождения счетчиков с реальными данными.
+
+    Возвращает словарь {имя счетчика: количество исправленных объектов}.
+    """
+    report = {}
+    for model, field, related_model, related_field in COUNTERS:
+        drifted = list(
+            model.objects.annotate(
+                actual=count_related(related_model, related_field)
+            ).exclude(**{field: F('actual')}).values_list('pk', flat=True)
+        )
+        if fix:
+            actual = count_related(related_model, related_field)
+            for start in range(0, len(drifted), batch_size):
+                model.objects.filter(
+                    pk__in=drifted[start:start + batch_size]
+                ).update(**{field: actual})
+        report[f'{model._meta.model_name}.{field}'] = len(drifted)
+    return report
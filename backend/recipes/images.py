@@ -0,0 +1,278 @@
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import locks
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.utils._os import safe_join
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+VARIANT_QUALITY = 85
+RECIPE_IMAGE_SIZES = {'small': (300, 300), 'medium': (800, 800)}
+AVATAR_SIZES = {'small': (64, 64), 'medium': (200, 200)}
+
+RESIZE_SIZES = frozenset((
+    (64, 64), (128, 128), (200, 200), (300, 300), (600, 600), (800, 800),
+))
+RESIZE_SOURCE_DIRS = ('recipes/', 'users/')
+# как часто обновлять время доступа к копии и проверять размер кеша, сек
+ATIME_UPDATE_INTERVAL = 60
+EVICTION_INTERVAL = 60
+# после очистки кеш занимает не больше этой доли лимита
+EVICTION_LOW_WATERMARK = 0.9
+LOCK_SUFFIX = '.lock'
+
+# модель: (поле изображения, поле вариантов, размеры)
+IMAGE_VARIANTS = {
+    'recipes.Recipe': ('image', 'image_variants', RECIPE_IMAGE_SIZES),
+    'users.User': ('avatar', 'avatar_variants', AVATAR_SIZES),
+}
+
+_executor = None
+_last_eviction = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANTS_WORKERS,
+            thread_name_prefix='image-variants',
+        )
+    return _executor
+
+
+def needs_variants(instance, image_field, variants_field):
+    """Нужно ли строить варианты для текущего изображения объекта."""
+    image = getattr(instance, image_field)
+    return bool(image) and (
+        getattr(instance, variants_field).get('source') != image.name
+    )
+
+
+def render_variant(image, size, image_format):
+    """Уменьшенная копия изображения в заданном формате."""
+    variant = ImageOps.exif_transpose(image)
+    variant.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGBA')
+        background = Image.new('RGB', variant.size, 'white')
+        background.paste(variant, mask=variant.getchannel('A'))
+        variant = background
+    buffer = BytesIO()
+    variant.save(buffer, image_format, quality=VARIANT_QUALITY)
+    return buffer.getvalue()
+
+
+def get_variant_name(name, size_name, extension):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(
+        directory, 'variants', f'{stem}_{size_name}.{extension}'
+    )
+
+
+def build_variants(field_file, sizes):
+    """
+    Строит варианты изображения и сохраняет их рядом с оригиналом.
+
+    Возвращает словарь {'source': имя оригинала,
+    размер: {формат: имя файла варианта}}.
+    """
+    variants = {'source': field_file.name}
+    with field_file.storage.open(field_file.name, 'rb') as source:
+        with Image.open(source) as image:
+            image.load()
+            for size_name, size in sizes.items():
+                variants[size_name] = {
+                    extension: field_file.storage.save(
+                        get_variant_name(field_file.name, size_name,
+                                         extension),
+                        ContentFile(render_variant(image, size, image_format))
+                    )
+                    for extension, image_format in VARIANT_FORMATS.items()
+                }
+    return variants
+
+
+def update_variants(model_label, pk):
+    """Строит варианты изображения объекта и записывает их в базу."""
+    model = apps.get_model(model_label)
+    image_field, variants_field, sizes = IMAGE_VARIANTS[model_label]
+    try:
+        instance = model.objects.only(
+            image_field, variants_field
+        ).filter(pk=pk).first()
+        if instance is None or not needs_variants(
+            instance, image_field, variants_field
+        ):
+            return
+        setattr(instance, variants_field, build_variants(
+            getattr(instance, image_field), sizes
+        ))
+        if model.objects.filter(
+            pk=pk, **{image_field: getattr(instance, image_field).name}
+        ).exists():
+            instance.save(update_fields=(variants_field,))
+    except Exception:
+        logger.exception(
+            'Не удалось построить варианты изображения %s %s',
+            model_label, pk
+        )
+    finally:
+        if settings.IMAGE_VARIANTS_WORKERS:
+            connection.close()
+
+
+def schedule_variants(instance):
+    """
+    Ставит построение вариантов изображения в очередь.
+
+    Варианты строит пул потоков процесса после фиксации транзакции;
+    при IMAGE_VARIANTS_WORKERS = 0 — синхронно, в том же потоке.
+    Пока вариантов нет, сериализаторы отдают ссылку на оригинал.
+    """
+    model_label = instance._meta.label
+    image_field, variants_field, _ = IMAGE_VARIANTS[model_label]
+    if not needs_variants(instance, image_field, variants_field):
+        return
+    if settings.IMAGE_VARIANTS_WORKERS:
+        get_executor().submit(update_variants, model_label, instance.pk)
+    else:
+        update_variants(model_label, instance.pk)
+
+
+def touch(path):
+    """
+    Отмечает обращение к файлу кеша; False, если файла нет.
+
+    Время доступа обновляется явно и не чаще ATIME_UPDATE_INTERVAL:
+    файловая система может быть смонтирована с noatime.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    now = time.time()
+    if now - stat.st_atime > ATIME_UPDATE_INTERVAL:
+        os.utime(path, (now, stat.st_mtime))
+    return True
+
+
+def render_resized(source, target, size):
+    with Image.open(source) as image:
+        content = render_variant(image, size, image.format or 'PNG')
+    with tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(target), delete=False
+    ) as temporary:
+        try:
+            temporary.write(content)
+        except OSError:
+            os.remove(temporary.name)
+            raise
+    os.replace(temporary.name, target)
+
+
+def get_resized_image(name, width, height):
+    """
+    Путь к уменьшенной копии файла из MEDIA_ROOT в дисковом кеше.
+
+    Копия строится при первом запросе под файловой блокировкой, поэтому
+    параллельные запросы из разных потоков и процессов рендерят ее
+    один раз. Возвращает None, если оригинала нет.
+    """
+    source = safe_join(settings.MEDIA_ROOT, name)
+    target = safe_join(
+        settings.IMAGE_RESIZE_CACHE_ROOT, f'{width}x{height}', name
+    )
+    if touch(target):
+        return target
+    if not os.path.isfile(source):
+        return None
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    lock_path = target + LOCK_SUFFIX
+    with open(lock_path, 'wb') as lock:
+        locks.lock(lock, locks.LOCK_EX)
+        try:
+            if not os.path.exists(target):
+                render_resized(source, target, (width, height))
+        except Exception:
+            # копии не будет, и блокировка без копии не нужна: иначе
+            # файлы .lock битых изображений копятся в кеше
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            raise
+        finally:
+            locks.unlock(lock)
+    maybe_evict_resized_images()
+    return target
+
+
+def evict_resized_images(max_size):
+    """
+    Удаляет копии, к которым дольше всего не обращались, пока кеш
+    не уменьшится до EVICTION_LOW_WATERMARK от max_size.
+
+    Возвращает количество удаленных файлов.
+    """
+    files, total = [], 0
+    for directory, _, filenames in os.walk(settings.IMAGE_RESIZE_CACHE_ROOT):
+        for filename in filenames:
+            if filename.endswith(LOCK_SUFFIX):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_atime, stat.st_size, path))
+            total += stat.st_size
+    if total <= max_size:
+        return 0
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_size * EVICTION_LOW_WATERMARK:
+            break
+        for stale in (path, path + LOCK_SUFFIX):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def maybe_evict_resized_images():
+    """
+    Чистит кеш копий не чаще раза в EVICTION_INTERVAL на процесс
+    и только в одном процессе одновременно.
+    """
+    global _last_eviction
+    if (
+        _last_eviction is not None
+        and time.monotonic() - _last_eviction < EVICTION_INTERVAL
+    ):
+        return
+    _last_eviction = time.monotonic()
+    path = os.path.join(
+        settings.IMAGE_RESIZE_CACHE_ROOT, 'evict' + LOCK_SUFFIX
+    )
+    with open(path, 'wb') as lock:
+        if not locks.lock(lock, locks.LOCK_EX | locks.LOCK_NB):
+            return
+        try:
+            evict_resized_images(settings.IMAGE_RESIZE_CACHE_MAX_SIZE)
+        finally:
+            locks.unlock(lock)
@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+import os
+import time
+from itertools import islice
+
+from django.db import connection, transaction
+
+from recipes.models import Ingredient, Tag
+
+# файл: (модель, столбцы); строка с такими же столбцами считается
+# ключом, совпадающие строки не добавляются повторно
+IMPORT_MODELS = {
+    'tags': (Tag, ('name', 'slug')),
+    'ingredients': (Ingredient, ('name', 'measurement_unit')),
+}
+IMPORT_FORMATS = ('csv', 'json')
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv_rows(file, columns):
+    """
+    Строки CSV как словари.
+
+    Если первая строка содержит названия всех столбцов, она считается
+    заголовком, иначе столбцы берутся по порядку.
+    """
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        return
+    if set(columns) <= set(header):
+        indexes = [header.index(column) for column in columns]
+    else:
+        indexes = range(len(columns))
+        yield dict(zip(columns, header))
+    for row in reader:
+        if row:
+            yield {
+                column: row[index] if index < len(row) else ''
+                for column, index in zip(columns, indexes)
+            }
+
+
+def read_json_rows(file):
+    """
+    Объекты JSON-массива (или JSON Lines) по одному, без чтения
+    всего файла.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n[,]':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = file.read(READ_CHUNK_SIZE), 0
+            eof = not buffer
+            continue
+        try:
+            row, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        position = end
+        yield row
+
+
+def read_rows(path, columns):
+    """Строки файла CSV или JSON как кортежи значений столбцов columns."""
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith('.csv'):
+            rows = read_csv_rows(file, columns)
+        else:
+            rows = read_json_rows(file)
+        for row in rows:
+            yield tuple(str(row.get(column, '')).strip()
+                        for column in columns)
+
+
+def find_import_file(directory, name, file_format=None):
+    """Путь к файлу name.csv или name.json; CSV предпочтительнее."""
+    for extension in (file_format,) if file_format else IMPORT_FORMATS:
+        path = os.path.join(directory, f'{name}.{extension}')
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def is_valid_row(model, columns, row):
+    return all(
+        value and len(value) <= model._meta.get_field(column).max_length
+        for column, value in zip(columns, row)
+    )
+
+
+def insert_rows(model, columns, rows):
+    """Добавляет строки, пропуская уже существующие."""
+    model.objects.bulk_create(
+        (model(**dict(zip(columns, row))) for row in rows),
+        ignore_conflicts=True,
+    )
+
+
+def copy_rows(model, columns, rows):
+    """
+    Добавляет строки через COPY во временную таблицу PostgreSQL и
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING; возвращает число
+    добавленных строк.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    staging = connection.ops.quote_name(f'{model._meta.db_table}_import')
+    column_list = ', '.join(map(connection.ops.quote_name, columns))
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} '
+            f'ON COMMIT DELETE ROWS '
+            f'AS SELECT {column_list} FROM {table} WITH NO DATA'
+        )
+        cursor.copy_expert(
+            f'COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+        cursor.execute(
+            f'INSERT INTO {table} ({column_list}) '
+            f'SELECT DISTINCT {column_list} FROM {staging} '
+            f'ON CONFLICT DO NOTHING'
+        )
+        return cursor.rowcount
+
+
+class Checkpoint:
+    """
+    Сколько строк каждого файла уже загружено.
+
+    Хранится в JSON-файле и записывается после каждой зафиксированной
+    пачки. Если файл данных изменился (размер или время изменения),
+    его загрузка начинается заново.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                self.state = json.load(file)
+
+    @staticmethod
+    def get_signature(data_path):
+        stat = os.stat(data_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get_position(self, data_path):
+        entry = self.state.get(os.path.abspath(data_path))
+        if entry and entry['signature'] == self.get_signature(data_path):
+            return entry['rows']
+        return 0
+
+    def save_position(self, data_path, rows):
+        if not self.path:
+            return
+        self.state[os.path.abspath(data_path)] = {
+            'signature': self.get_signature(data_path), 'rows': rows,
+        }
+        temporary_path = f'{self.path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(self.state, file)
+        os.replace(temporary_path, self.path)
+
+
+def import_file(path, model, columns, batch_size, checkpoint,
+                progress=None):
+    """
+    Загружает файл пачками по batch_size строк, каждая — в своей
+    транзакции.
+
+    Строки, загруженные до сохраненной позиции checkpoint, пропускаются.
+    progress(прочитано строк, строк в секунду) вызывается после каждой
+    пачки. Возвращает (прочитано, добавлено или None, пропущено
+    некорректных).
+    """
+    use_copy = connection.vendor == 'postgresql'
+    position = checkpoint.get_position(path)
+    rows = islice(read_rows(path, columns), position, None)
+    processed, inserted, invalid = position, 0, 0
+    started = time.perf_counter()
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        valid = [row for row in batch
+                 if is_valid_row(model, columns, row)]
+        invalid += len(batch) - len(valid)
+        with transaction.atomic():
+            if valid and use_copy:
+                inserted += copy_rows(model, columns, valid)
+            elif valid:
+                insert_rows(model, columns, valid)
+        processed += len(batch)
+        checkpoint.save_position(path, processed)
+        if progress:
+            progress(processed, (processed - position) / max(
+                time.perf_counter() - started, 1e-9
+            ))
+    return processed, inserted if use_copy else None, invalid
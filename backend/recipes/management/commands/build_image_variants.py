@@ -0,0 +1,33 @@
+from django.apps import apps
+from django.core.management import BaseCommand
+
+from recipes.images import IMAGE_VARIANTS, needs_variants, update_variants
+
+
+class Command(BaseCommand):
+    """Строит уменьшенные копии изображений рецептов и аватаров."""
+
+    help = (
+        'Строит варианты изображений, которых еще нет, например для '
+        'файлов, загруженных до появления вариантов. Работает синхронно, '
+        'без пула потоков.'
+    )
+
+    def handle(self, *args, **options):
+        for model_label, (image_field, variants_field, _) in (
+            IMAGE_VARIANTS.items()
+        ):
+            model = apps.get_model(model_label)
+            pks = [
+                instance.pk for instance in
+                model.objects.exclude(**{image_field: ''})
+                .exclude(**{f'{image_field}__isnull': True})
+                .only(image_field, variants_field).iterator()
+                if needs_variants(instance, image_field, variants_field)
+            ]
+            for pk in pks:
+                update_variants(model_label, pk)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: '
+                f'обработано объектов {len(pks)}'
+            ))
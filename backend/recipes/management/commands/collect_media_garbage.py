@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+
+from recipes.models import Recipe
+from recipes.storage import GARBAGE_MIN_AGE, collect_garbage
+
+
+class Command(BaseCommand):
+    """Удаляет изображения, на которые не ссылается ни один объект."""
+
+    help = (
+        'Подсчитывает ссылки на файлы рецептов, аватаров и их вариантов '
+        'и удаляет файлы без ссылок старше --min-age часов. '
+        'С --dry-run только выводит отчет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=float, default=GARBAGE_MIN_AGE / 3600
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        total, deleted, freed, shared = collect_garbage(
+            Recipe._meta.get_field('image').storage,
+            min_age=options['min_age'] * 3600,
+            dry_run=options['dry_run'],
+        )
+        action = 'к удалению' if options['dry_run'] else 'удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'файлов {total}, {action} {deleted} '
+            f'({freed / 1024 / 1024:.1f} МБ), '
+            f'используемых несколькими объектами {shared}'
+        ))
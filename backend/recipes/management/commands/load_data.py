@@ -1,35 +1,55 @@
-import json
 import os
 
 from django.conf import settings
 from django.core.management import BaseCommand
 
-from recipes.models import Ingredient, Tag
-
-MODEL_MAP = {
-    'tags': Tag,
-    'ingredients': Ingredient,
-}
+from recipes.importer import (IMPORT_FORMATS, IMPORT_MODELS, Checkpoint,
+                              find_import_file, import_file)
 
 
 class Command(BaseCommand):
     """Класс загрузки тестовой базы данных."""
 
+    help = (
+        'Загружает теги и ингредиенты из файлов tags и ingredients '
+        '(.csv или .json) потоково, пачками по --batch-size строк в '
+        'отдельных транзакциях; существующие строки не дублируются. '
+        'На PostgreSQL пачки загружаются через COPY во временную таблицу. '
+        'С --resume продолжает с места, сохраненного в --checkpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.JSON_FILES_DIR)
+        parser.add_argument('--format', choices=IMPORT_FORMATS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--resume', action='store_true')
+        parser.add_argument('--checkpoint')
+
     def handle(self, *args, **options):
-        for file_name, model in MODEL_MAP.items():
-            path = os.path.join(settings.JSON_FILES_DIR, f'{file_name}.json')
-            if not os.path.exists(path):
+        checkpoint_path = options['checkpoint'] or os.path.join(
+            options['dir'], '.load_data.checkpoint.json'
+        )
+        if not options['resume'] and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        checkpoint = Checkpoint(checkpoint_path)
+        for name, (model, columns) in IMPORT_MODELS.items():
+            path = find_import_file(options['dir'], name, options['format'])
+            if path is None:
                 self.stdout.write(self.style.WARNING(
-                    f'Файл {file_name}.json не найден.'
+                    f'Файл {name} ({", ".join(IMPORT_FORMATS)}) не найден.'
                 ))
-                return
-            self.stdout.write(f'Началась загрузка файла: {file_name}.json')
-            objects = []
-            with open(path, encoding='utf-8') as f:
-                data = json.load(f)
-                for row in data:
-                    objects.append(model(**row))
-            model.objects.bulk_create(objects, ignore_conflicts=True)
-            self.stdout.write(self.style.SUCCESS(
-                f'Загрузка {file_name}.json завершена'
-            ))
+                continue
+            file_name = os.path.basename(path)
+            self.stdout.write(f'Началась загрузка файла: {file_name}')
+            processed, inserted, invalid = import_file(
+                path, model, columns, options['batch_size'], checkpoint,
+                progress=lambda rows, speed: self.stdout.write(
+                    f'  {file_name}: {rows} строк, {speed:.0f} строк/с'
+                ),
+            )
+            report = f'Загрузка {file_name} завершена: строк {processed}'
+            if inserted is not None:
+                report += f', добавлено {inserted}'
+            if invalid:
+                report += f', пропущено некорректных {invalid}'
+            self.stdout.write(self.style.SUCCESS(report))
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import BATCH_SIZE, get_expected_shopping_lists
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Пересчитывает или проверяет списки покупок пользователей."""
+
+    help = (
+        'Сверяет таблицу ShoppingListItem с корзинами пользователей и '
+        'пересобирает расхождения. С --verify только выводит отчет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        verify, batch_size = options['verify'], options['batch_size']
+        user_ids = (
+            User.objects.filter(
+                Q(shopping_carts__isnull=False)
+                | Q(shopping_list_items__isnull=False)
+            ).distinct().order_by('id').values_list('id', flat=True)
+        )
+        checked = mismatched = 0
+        last_id = 0
+        while True:
+            batch = list(user_ids.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1]
+            with transaction.atomic():
+                items = ShoppingListItem.objects.filter(user_id__in=batch)
+                expected = get_expected_shopping_lists(batch)
+                actual = {
+                    (user_id, ingredient_id): total
+                    for user_id, ingredient_id, total in items.values_list(
+                        'user_id', 'ingredient_id', 'total_amount'
+                    )
+                }
+                broken = {
+                    user_id for (user_id, _), _ in
+                    set(expected.items()) ^ set(actual.items())
+                }
+                checked += len(batch)
+                mismatched += len(broken)
+                if broken and not verify:
+                    items.filter(user_id__in=broken).delete()
+                    ShoppingListItem.objects.bulk_create(
+                        (
+                            ShoppingListItem(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                total_amount=total
+                            )
+                            for (user_id, ingredient_id), total
+                            in expected.items() if user_id in broken
+                        ),
+                        batch_size=batch_size,
+                    )
+            self.stdout.write(
+                f'Проверено пользователей: {checked}, '
+                f'с расхождениями: {mismatched}'
+            )
+        style = self.style.WARNING if mismatched else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Готово. Списков с расхождениями: {mismatched}'
+            + ('' if verify or not mismatched else ' (исправлены)')
+        ))
@@ -0,0 +1,27 @@
+from django.core.management import BaseCommand
+
+from recipes.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    """Сверяет денормализованные счетчики с реальными данными."""
+
+    help = (
+        'Пересчитывает favorites_count и in_carts_count рецептов, '
+        'recipes_count и followers_count пользователей там, где они '
+        'разошлись с данными. С --verify только выводит отчет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        report = reconcile_counters(
+            options['batch_size'], fix=not options['verify']
+        )
+        for counter, drifted in report.items():
+            style = self.style.WARNING if drifted else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{counter}: расхождений {drifted}'
+            ))
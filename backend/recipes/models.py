@@ -1,8 +1,10 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 from recipes.constants import Constants
+from recipes.storage import ContentAddressedStorage
 
 
 class AbstractTitle(models.Model):
@@ -125,6 +127,7 @@ class Recipe(AbstractTitle):
     image = models.ImageField(
         'Изображение',
         upload_to='recipes/%Y/%m/%d/',
+        storage=ContentAddressedStorage(),
     )
     text = models.TextField('Описание')
     cooking_time = models.PositiveSmallIntegerField(
@@ -135,12 +138,37 @@ class Recipe(AbstractTitle):
     pub_date = models.DateTimeField(
         'Дата публикации', auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения', auto_now=True
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор', null=True, editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Количество добавлений в избранное', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Количество добавлений в список покупок', default=0, editable=False
+    )
+    image_variants = models.JSONField(
+        'Варианты изображения', default=dict, editable=False
+    )
 
     class Meta(AbstractTitle.Meta):
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+        )
 
 
 class AbstractUserRecipe(models.Model):
@@ -190,3 +218,37 @@ class Favorite(AbstractUserRecipe):
         verbose_name = 'рецепт в избранном'
         verbose_name_plural = 'Рецепты в избранном'
         default_related_name = 'favorites'
+
+
+class ShoppingListItem(models.Model):
+    """Модель для суммарного количества ингредиента в списке покупок."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.PositiveIntegerField('Общее количество')
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        verbose_name = 'ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        default_related_name = 'shopping_list_items'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_user_ingredient'
+            ),
+        )
+
+    def __str__(self):
+        return (
+            f'{self.ingredient.name} — {self.total_amount} '
+            f'{self.ingredient.measurement_unit}'.strip()
+        )
@@ -0,0 +1,224 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.db.models import Q
+
+from recipes.counters import change_counter, change_counters
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from recipes.shopping_list import (add_recipes_to_shopping_list,
+                                   remove_recipes_from_shopping_list,
+                                   update_recipe_in_shopping_lists)
+from users.models import Follow
+
+User = get_user_model()
+
+ADDED = 'added'
+REMOVED = 'removed'
+ALREADY_ADDED = 'already_added'
+NOT_ADDED = 'not_added'
+NOT_FOUND = 'not_found'
+
+RELATION_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def supports_insert_returning(connection):
+    """Умеет ли база INSERT ... ON CONFLICT DO NOTHING RETURNING."""
+    return connection.vendor == 'postgresql' or (
+        connection.vendor == 'sqlite'
+        and connection.Database.sqlite_version_info >= (3, 35)
+    )
+
+
+def insert_ignore_conflicts(model, rows, returning):
+    """
+    Вставляет строки, пропуская нарушающие уникальность.
+
+    rows — список словарей {attname поля: значение}. Возвращает значения
+    поля returning у строк, которые действительно были добавлены.
+    На PostgreSQL и SQLite 3.35+ это один запрос INSERT ... ON CONFLICT
+    DO NOTHING RETURNING, поэтому повторный или параллельный запрос
+    не падает на уникальном ограничении. На остальных базах
+    существующие строки отбираются заранее, а вставка идет через
+    bulk_create(ignore_conflicts=True).
+    """
+    if not rows:
+        return []
+    connection = connections[router.db_for_write(model)]
+    if not supports_insert_returning(connection):
+        existing = set(model.objects.filter(
+            Q(*(Q(**row) for row in rows), _connector=Q.OR)
+        ).values_list(returning, flat=True))
+        rows = [row for row in rows if row[returning] not in existing]
+        model.objects.bulk_create(
+            (model(**row) for row in rows), ignore_conflicts=True
+        )
+        return [row[returning] for row in rows]
+    opts = model._meta
+    fields = [opts.get_field(attname) for attname in rows[0]]
+    quote_name = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote_name(opts.db_table)} '
+            f'({", ".join(quote_name(field.column) for field in fields)}) '
+            f'VALUES {", ".join([f"({placeholders})"] * len(rows))} '
+            f'ON CONFLICT DO NOTHING '
+            f'RETURNING {quote_name(opts.get_field(returning).column)}',
+            [
+                field.get_db_prep_save(row[field.attname], connection)
+                for row in rows for field in fields
+            ]
+        )
+        return [value for value, in cursor.fetchall()]
+
+
+def insert_user_recipes(model, user, recipe_ids):
+    """
+    Добавляет рецепты в избранное или корзину пользователя.
+
+    Вставка идет в обход сигналов, поэтому счетчики и список покупок
+    обновляются здесь же. Возвращает id добавленных рецептов.
+    """
+    added = insert_ignore_conflicts(model, [
+        {'user_id': user.pk, 'recipe_id': recipe_id}
+        for recipe_id in recipe_ids
+    ], 'recipe_id')
+    change_counters(Recipe, added, RELATION_COUNTERS[model], 1)
+    if model is ShoppingCart:
+        add_recipes_to_shopping_list(user, added)
+    return added
+
+
+def add_user_recipes(model, user, recipe_ids):
+    """
+    Массово добавляет рецепты в избранное или корзину пользователя.
+
+    Возвращает словарь {id рецепта: статус} и список добавленных id.
+    """
+    found = set(
+        Recipe.objects.filter(pk__in=recipe_ids)
+        .values_list('pk', flat=True)
+    )
+    added = set(insert_user_recipes(model, user, [
+        recipe_id for recipe_id in recipe_ids if recipe_id in found
+    ]))
+    return {
+        recipe_id: (
+            NOT_FOUND if recipe_id not in found
+            else ADDED if recipe_id in added
+            else ALREADY_ADDED
+        )
+        for recipe_id in recipe_ids
+    }, added
+
+
+def delete_rows(model, values, field='pk'):
+    """
+    Удаляет строки, у которых поле field принимает одно из значений
+    values, одним запросом DELETE, без сигналов post_delete:
+    QuerySet.delete() при подключенных сигналах выбирает строки и
+    отправляет сигнал на каждую.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    column = (
+        model._meta.pk if field == 'pk' else model._meta.get_field(field)
+    ).column
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote_name(model._meta.db_table)} '
+            f'WHERE {quote_name(column)} '
+            f'IN ({", ".join(["%s"] * len(values))})',
+            values
+        )
+
+
+def delete_recipes(recipe_ids):
+    """
+    Удаляет рецепты вместе с их ингредиентами, избранным и корзинами.
+
+    Связанные строки удаляются до рецептов одним запросом на таблицу в
+    обход сигналов, а рецепты вычитаются из списков покупок сразу
+    целиком: при каскадном удалении сигналы сработали бы на каждую
+    строку. Вызывается внутри транзакции.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    amounts = defaultdict(dict)
+    for recipe_id, ingredient_id, amount in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient_id', 'amount'):
+        amounts[recipe_id][ingredient_id] = (
+            amounts[recipe_id].get(ingredient_id, 0) + amount
+        )
+    for recipe_id in recipe_ids:
+        update_recipe_in_shopping_lists(recipe_id, amounts[recipe_id], {})
+    for model in (ShoppingCart, Favorite, RecipeIngredient):
+        delete_rows(model, recipe_ids, 'recipe')
+    Recipe.objects.filter(pk__in=recipe_ids).delete()
+
+
+def delete_user_recipes(model, user, recipe_ids):
+    """
+    Удаляет связи пользователя с рецептами; возвращает id рецептов,
+    связи с которыми удалил именно этот вызов.
+
+    Строки сначала блокируются select_for_update(): параллельный запрос
+    на удаление тех же связей дождется фиксации транзакции и уже не
+    найдет их, поэтому счетчики и список покупок не уменьшатся дважды.
+    Удаление, как и вставка, идет в обход сигналов, поэтому счетчики
+    и список покупок обновляются здесь же, сразу для всех рецептов.
+    Вызывается внутри транзакции.
+    """
+    locked = list(
+        model.objects.select_for_update()
+        .filter(user=user, recipe_id__in=recipe_ids)
+        .values_list('pk', 'recipe_id')
+    )
+    if not locked:
+        return []
+    removed = [recipe_id for _, recipe_id in locked]
+    delete_rows(model, [pk for pk, _ in locked])
+    change_counters(Recipe, removed, RELATION_COUNTERS[model], -1)
+    if model is ShoppingCart:
+        remove_recipes_from_shopping_list(user, removed)
+    return removed
+
+
+def remove_user_recipes(model, user, recipe_ids):
+    """
+    Убирает рецепты из избранного или корзины пользователя.
+
+    Возвращает словарь {id рецепта: статус} и список удаленных id.
+    """
+    found = set(
+        Recipe.objects.filter(pk__in=recipe_ids)
+        .values_list('pk', flat=True)
+    )
+    removed = delete_user_recipes(model, user, [
+        recipe_id for recipe_id in recipe_ids if recipe_id in found
+    ])
+    removed_set = set(removed)
+    return {
+        recipe_id: (
+            NOT_FOUND if recipe_id not in found
+            else REMOVED if recipe_id in removed_set
+            else NOT_ADDED
+        )
+        for recipe_id in recipe_ids
+    }, removed
+
+
+def follow_author(user, author):
+    """Подписывает пользователя на автора, если подписки еще нет."""
+    if not insert_ignore_conflicts(
+        Follow, [{'user_id': user.pk, 'author_id': author.pk}], 'author_id'
+    ):
+        return False
+    change_counter(User, author.pk, 'followers_count', 1)
+    return True
@@ -0,0 +1,85 @@
+import re
+
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+SQLITE_FTS_TABLE = 'recipes_recipe_fts'
+
+
+def get_search_vector():
+    """Поисковый вектор рецепта: название важнее описания."""
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_index(recipe):
+    """Обновляет поисковый индекс для сохраненного рецепта."""
+    connection = connections[recipe._state.db]
+    if connection.vendor == 'postgresql':
+        type(recipe).objects.filter(pk=recipe.pk).update(
+            search_vector=get_search_vector()
+        )
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = %s',
+                (recipe.pk,)
+            )
+            cursor.execute(
+                f'INSERT INTO {SQLITE_FTS_TABLE} (rowid, name, text) '
+                f'VALUES (%s, %s, %s)',
+                (recipe.pk, recipe.name, recipe.text)
+            )
+
+
+def delete_search_index(recipe):
+    """Удаляет рецепт из поискового индекса SQLite."""
+    connection = connections[recipe._state.db]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = %s',
+                (recipe.pk,)
+            )
+
+
+def make_fts_query(value):
+    """Запрос FTS5 из слов строки поиска, каждое слово — префикс."""
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', value))
+
+
+def search_recipes(queryset, value):
+    """
+    Отбирает рецепты по полнотекстовому запросу и сортирует по релевантности.
+
+    На PostgreSQL используется столбец search_vector с GIN-индексом,
+    на SQLite — виртуальная таблица FTS5.
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date')
+    fts_query = make_fts_query(value)
+    if not fts_query:
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {SQLITE_FTS_TABLE} '
+        f'WHERE {SQLITE_FTS_TABLE} MATCH %s',
+        (fts_query,)
+    )).annotate(rank=RawSQL(
+        f'SELECT -bm25({SQLITE_FTS_TABLE}) FROM {SQLITE_FTS_TABLE} '
+        f'WHERE {SQLITE_FTS_TABLE} MATCH %s '
+        f'AND rowid = "{table}"."id"',
+        (fts_query,),
+        output_field=FloatField()
+    )).order_by('-rank', '-pub_date')
@@ -0,0 +1,115 @@
+from collections import Counter
+
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest, Now
+
+from recipes.models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def get_recipe_amounts(recipe_ids):
+    """Количество каждого ингредиента в переданных рецептах."""
+    return Counter(dict(
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .values_list('ingredient_id')
+        .annotate(total=Sum('amount')).order_by()
+    ))
+
+
+def apply_shopping_list_deltas(user_ids, deltas):
+    """
+    Изменяет списки покупок пользователей на переданные количества.
+
+    deltas — словарь {id ингредиента: изменение количества}.
+    Вызывается в одной транзакции с изменением корзины или рецепта.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not deltas:
+        return
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), BATCH_SIZE):
+        batch = user_ids[start:start + BATCH_SIZE]
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=0
+                )
+                for user_id in batch
+                for ingredient_id, delta in deltas.items() if delta > 0
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        items = ShoppingListItem.objects.filter(
+            user_id__in=batch, ingredient_id__in=deltas
+        )
+        items.update(updated_at=Now(), total_amount=Greatest(
+            F('total_amount') + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(delta))
+                    for ingredient_id, delta in deltas.items()
+                ),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            0
+        ))
+        items.filter(total_amount=0).delete()
+
+
+def add_recipes_to_shopping_list(user, recipe_ids):
+    """Добавляет ингредиенты рецептов в список покупок пользователя."""
+    apply_shopping_list_deltas((user.id,), get_recipe_amounts(recipe_ids))
+
+
+def remove_recipes_from_shopping_list(user, recipe_ids):
+    """Убирает ингредиенты рецептов из списка покупок пользователя."""
+    apply_shopping_list_deltas((user.id,), {
+        ingredient_id: -amount
+        for ingredient_id, amount in get_recipe_amounts(recipe_ids).items()
+    })
+
+
+def change_recipe_in_shopping_list(user_id, recipe_id, sign):
+    """
+    Добавляет (sign=1) или убирает (sign=-1) ингредиенты рецепта
+    в списке покупок пользователя.
+    """
+    apply_shopping_list_deltas((user_id,), {
+        ingredient_id: sign * amount
+        for ingredient_id, amount in get_recipe_amounts((recipe_id,)).items()
+    })
+
+
+def update_recipe_in_shopping_lists(recipe_id, old_amounts, new_amounts):
+    """
+    Переносит изменение состава рецепта в списки покупок всех
+    пользователей, у которых рецепт лежит в корзине.
+    """
+    deltas = Counter(new_amounts)
+    deltas.subtract(old_amounts)
+    apply_shopping_list_deltas(
+        ShoppingCart.objects.filter(recipe_id=recipe_id)
+        .values_list('user_id', flat=True),
+        deltas
+    )
+
+
+def get_expected_shopping_lists(user_ids):
+    """Списки покупок пользователей, посчитанные по корзинам."""
+    return {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in (
+            ShoppingCart.objects
+            .filter(user_id__in=user_ids,
+                    recipe__recipe_ingredients__isnull=False)
+            .values_list('user_id', 'recipe__recipe_ingredients__ingredient')
+            .annotate(total=Sum('recipe__recipe_ingredients__amount'))
+            .order_by()
+        )
+    }
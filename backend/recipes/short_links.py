@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+
+from recipes.models import Recipe
+
+# через сколько секунд карта перечитывается из базы: так процесс узнает
+# о рецептах, удаленных в других процессах
+RECIPE_IDS_REFRESH_INTERVAL = 10 * 60
+NEGATIVE_CACHE_SIZE = 1024
+NEGATIVE_CACHE_TIMEOUT = 60
+LOAD_CHUNK_SIZE = 10000
+MAX_RECIPE_ID = 2 ** 63 - 1
+
+
+def set_bit(bits, number):
+    index, offset = divmod(number, 8)
+    if index >= len(bits):
+        bits.extend(bytes(index - len(bits) + 1))
+    bits[index] |= 1 << offset
+
+
+def has_bit(bits, number):
+    index, offset = divmod(number, 8)
+    return index < len(bits) and bool(bits[index] & (1 << offset))
+
+
+class RecipeIdSet:
+    """
+    Множество id рецептов в памяти процесса для коротких ссылок.
+
+    Битовая карта (бит на id, 1 млн рецептов — 125 КБ) заполняется из
+    базы при первом обращении и раз в RECIPE_IDS_REFRESH_INTERVAL,
+    а между перечитываниями — сигналами создания и удаления рецептов
+    этого процесса. Рецепт, которого нет в карте (например, созданный
+    другим процессом), проверяется в базе; отсутствующие id попадают
+    в небольшой кеш промахов, чтобы повторные запросы по несуществующей
+    ссылке тоже не доходили до базы.
+    """
+
+    def __init__(self):
+        self.bits = bytearray()
+        self.loaded_at = None
+        self.misses = OrderedDict()
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+    def is_stale(self):
+        return self.loaded_at is None or (
+            time.monotonic() - self.loaded_at > RECIPE_IDS_REFRESH_INTERVAL
+        )
+
+    def load(self):
+        bits = bytearray()
+        for pk in Recipe.objects.order_by().values_list(
+            'pk', flat=True
+        ).iterator(chunk_size=LOAD_CHUNK_SIZE):
+            set_bit(bits, pk)
+        with self.lock:
+            self.bits = bits
+            self.misses.clear()
+            self.loaded_at = time.monotonic()
+
+    def add(self, pk):
+        with self.lock:
+            set_bit(self.bits, pk)
+            self.misses.pop(pk, None)
+
+    def discard(self, pk):
+        index, offset = divmod(pk, 8)
+        with self.lock:
+            if index < len(self.bits):
+                self.bits[index] &= ~(1 << offset) & 0xFF
+
+    def remember_miss(self, pk):
+        with self.lock:
+            self.misses[pk] = time.monotonic() + NEGATIVE_CACHE_TIMEOUT
+            self.misses.move_to_end(pk)
+            while len(self.misses) > NEGATIVE_CACHE_SIZE:
+                self.misses.popitem(last=False)
+
+    def exists(self, pk):
+        """Есть ли рецепт с таким id."""
+        if not 0 < pk <= MAX_RECIPE_ID:
+            return False
+        if self.is_stale():
+            with self.load_lock:
+                if self.is_stale():
+                    self.load()
+        if has_bit(self.bits, pk):
+            return True
+        expires = self.misses.get(pk)
+        if expires is not None and expires > time.monotonic():
+            return False
+        if Recipe.objects.filter(pk=pk).exists():
+            self.add(pk)
+            return True
+        self.remember_miss(pk)
+        return False
+
+
+recipe_ids = RecipeIdSet()
@@ -0,0 +1,148 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.images import IMAGE_VARIANTS, schedule_variants
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from recipes.search import delete_search_index, update_search_index
+from recipes.shopping_list import (change_recipe_in_shopping_list,
+                                   update_recipe_in_shopping_lists)
+from recipes.short_links import recipe_ids
+from users.models import Follow
+
+User = get_user_model()
+
+SEARCH_FIELDS = frozenset(('name', 'text'))
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(instance, update_fields, **kwargs):
+    if update_fields and SEARCH_FIELDS.isdisjoint(update_fields):
+        return
+    update_search_index(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(instance, **kwargs):
+    delete_search_index(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_id(instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(recipe_ids.add, instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def discard_recipe_id(instance, **kwargs):
+    transaction.on_commit(partial(recipe_ids.discard, instance.pk))
+
+
+@receiver(post_save, sender=Favorite)
+def increase_favorites_count(instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrease_favorites_count(instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def increase_in_carts_count(instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_in_carts_count(instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'in_carts_count', -1)
+
+
+@receiver(pre_save, sender=ShoppingCart)
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_previous_state(sender, instance, **kwargs):
+    instance.previous_state = (
+        sender.objects.filter(pk=instance.pk).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_shopping_list(instance, created, **kwargs):
+    previous = getattr(instance, 'previous_state', None)
+    if previous is not None and not created:
+        if (previous.user_id, previous.recipe_id) == (
+            instance.user_id, instance.recipe_id
+        ):
+            return
+        change_recipe_in_shopping_list(
+            previous.user_id, previous.recipe_id, -1
+        )
+    change_recipe_in_shopping_list(instance.user_id, instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_recipe_from_shopping_list(instance, **kwargs):
+    change_recipe_in_shopping_list(instance.user_id, instance.recipe_id, -1)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_ingredient_in_shopping_lists(instance, created, **kwargs):
+    previous = getattr(instance, 'previous_state', None)
+    old_amounts = {}
+    if previous is not None and not created:
+        if previous.recipe_id != instance.recipe_id:
+            update_recipe_in_shopping_lists(
+                previous.recipe_id, {previous.ingredient_id: previous.amount},
+                {}
+            )
+        else:
+            old_amounts = {previous.ingredient_id: previous.amount}
+    update_recipe_in_shopping_lists(
+        instance.recipe_id, old_amounts,
+        {instance.ingredient_id: instance.amount}
+    )
+
+
+@receiver(post_delete, sender=RecipeIngredient)
+def remove_ingredient_from_shopping_lists(instance, **kwargs):
+    update_recipe_in_shopping_lists(
+        instance.recipe_id, {instance.ingredient_id: instance.amount}, {}
+    )
+
+
+@receiver(post_save, sender=Follow)
+def increase_followers_count(instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrease_followers_count(instance, **kwargs):
+    change_counter(User, instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def build_image_variants(sender, instance, update_fields, **kwargs):
+    image_field, _, _ = IMAGE_VARIANTS[sender._meta.label]
+    if update_fields and image_field not in update_fields:
+        return
+    transaction.on_commit(partial(schedule_variants, instance))
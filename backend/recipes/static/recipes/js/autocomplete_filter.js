@@ -0,0 +1,20 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    $(function() {
+        $('.autocomplete-filter').on('change', function() {
+            const $select = $(this);
+            const value = $select.val();
+            let url = $select.data('filter-url');
+            if (value) {
+                if (!url.endsWith('?')) {
+                    url += url.includes('?') ? '&' : '?';
+                }
+                url += encodeURIComponent($select.data('filter-param'))
+                    + '=' + encodeURIComponent(value);
+            }
+            window.location = url;
+        });
+    });
+}
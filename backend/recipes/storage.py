@@ -0,0 +1,156 @@
+import hashlib
+import os
+import posixpath
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Q
+from django.utils.deconstruct import deconstructible
+
+from recipes.images import IMAGE_VARIANTS, RESIZE_SOURCE_DIRS
+
+HASH_CHUNK_SIZE = 64 * 1024
+# файлы моложе этого возраста не удаляются: объект, который на них
+# ссылается, может быть еще не сохранен, сек
+GARBAGE_MIN_AGE = 24 * 60 * 60
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, которое называет файлы по SHA-256 содержимого.
+
+    Файл recipes/2024/01/01/<uuid>.png сохраняется как
+    recipes/ab/cd/<sha256>.png: от исходного имени остаются только
+    верхний каталог и расширение. Если файл с таким содержимым уже
+    есть, он не перезаписывается — возвращается имя существующего.
+    Одно и то же изображение может использоваться несколькими
+    объектами, поэтому файлы не удаляются при замене: неиспользуемые
+    файлы удаляет команда collect_media_garbage.
+    """
+
+    @staticmethod
+    def get_content_hash(content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+    def get_content_name(self, name, content):
+        """Имя файла в хранилище для заданного содержимого."""
+        content_hash = self.get_content_hash(content)
+        name = name.replace('\\', '/')
+        directory = name.split('/', 1)[0] if '/' in name else ''
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(
+            directory, content_hash[:2], content_hash[2:4],
+            content_hash + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            # свежее время изменения защищает файл от collect_garbage,
+            # пока объект, который на него ссылается, не сохранен
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                pass
+        # при одновременной загрузке одинаковых файлов второй получит
+        # имя с суффиксом: дубликат, но без потери данных
+        return super().save(name, content, max_length)
+
+
+def count_media_references():
+    """
+    Число ссылок из базы на каждый файл изображений и их вариантов.
+
+    Считается пакетно, по всем объектам сразу: оригиналы и варианты
+    меняются в том числе через update() и update_fields, где
+    поддерживать счетчик на каждое изменение ненадежно.
+    """
+    references = Counter()
+    for model_label, (image_field, variants_field, _) in (
+        IMAGE_VARIANTS.items()
+    ):
+        model = apps.get_model(model_label)
+        for name, variants in model.objects.values_list(
+            image_field, variants_field
+        ).iterator():
+            if name:
+                references[name] += 1
+            for size_name, formats in variants.items():
+                if size_name != 'source':
+                    references.update(formats.values())
+    return references
+
+
+def is_media_referenced(name):
+    """Есть ли в базе ссылка на файл: проверка прямо перед удалением."""
+    for model_label, (image_field, variants_field, _) in (
+        IMAGE_VARIANTS.items()
+    ):
+        model = apps.get_model(model_label)
+        if model.objects.filter(
+            Q(**{image_field: name})
+            | Q(**{f'{variants_field}__icontains': name})
+        ).exists():
+            return True
+    return False
+
+
+def collect_garbage(storage, min_age=GARBAGE_MIN_AGE, dry_run=False):
+    """
+    Удаляет файлы изображений, на которые нет ссылок из базы.
+
+    Ссылки считаются один раз в начале, но перед удалением каждого
+    файла проверяются заново вместе с временем изменения: файл мог
+    понадобиться объекту, сохраненному за время обхода.
+
+    Возвращает (число файлов, число удаленных, освобождено байт,
+    число файлов с несколькими ссылками).
+    """
+    references = count_media_references()
+    shared = sum(1 for count in references.values() if count > 1)
+    cutoff = time.time() - min_age
+    total = deleted = freed = 0
+    for directory in RESIZE_SOURCE_DIRS:
+        root = storage.path(directory)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, storage.location).replace(
+                    os.sep, '/'
+                )
+                total += 1
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if references[name] or stat.st_mtime > cutoff:
+                    continue
+                if is_media_referenced(name):
+                    continue
+                try:
+                    if os.stat(path).st_mtime > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                if not dry_run:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        continue
+                deleted += 1
+                freed += stat.st_size
+    return total, deleted, freed, shared
@@ -1,8 +1,20 @@
-from django.http import HttpResponse, HttpResponsePermanentRedirect
-from django.shortcuts import get_object_or_404
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponsePermanentRedirect)
+from django.utils.cache import patch_cache_control
 from django.utils.http import base36_to_int
+from django.views.decorators.http import require_safe
+from PIL import Image
+
+from recipes.images import RESIZE_SIZES, RESIZE_SOURCE_DIRS, get_resized_image
+from recipes.short_links import recipe_ids
 
-from recipes.models import Recipe
+RESIZED_IMAGE_MAX_AGE = 60 * 60 * 24 * 30
 
 
 def short_link_redirect(request, short_link_id):
@@ -11,6 +23,44 @@ def short_link_redirect(request, short_link_id):
         recipe_id = base36_to_int(short_link_id)
     except ValueError:
         return HttpResponse('Некорректная ссылка', status=400)
-    return HttpResponsePermanentRedirect(request.build_absolute_uri(
-        f'/recipes/{get_object_or_404(Recipe, pk=recipe_id).id}'
-    ))
+    if not recipe_ids.exists(recipe_id):
+        raise Http404
+    return HttpResponsePermanentRedirect(
+        request.build_absolute_uri(f'/recipes/{recipe_id}')
+    )
+
+
+@require_safe
+def resized_image(request, width, height, path):
+    """
+    Отдает уменьшенную копию изображения из MEDIA_ROOT.
+
+    Размеры ограничены RESIZE_SIZES. Если задан IMAGE_RESIZE_ACCEL_PREFIX,
+    файл из кеша отдает nginx по заголовку X-Accel-Redirect.
+    """
+    if (
+        (width, height) not in RESIZE_SIZES
+        or not path.startswith(RESIZE_SOURCE_DIRS)
+    ):
+        raise Http404
+    try:
+        resized = get_resized_image(path, width, height)
+    except (SuspiciousFileOperation, OSError, Image.DecompressionBombError):
+        # битый или слишком большой файл — как отсутствующий
+        raise Http404
+    if resized is None:
+        raise Http404
+    if settings.IMAGE_RESIZE_ACCEL_PREFIX:
+        response = HttpResponse(
+            content_type=mimetypes.guess_type(resized)[0]
+        )
+        response['X-Accel-Redirect'] = quote(
+            f'{settings.IMAGE_RESIZE_ACCEL_PREFIX}{width}x{height}/{path}'
+        )
+    else:
+        response = FileResponse(open(resized, 'rb'))
+    response['Content-Disposition'] = (
+        f'inline; filename="{os.path.basename(resized)}"'
+    )
+    patch_cache_control(response, public=True, max_age=RESIZED_IMAGE_MAX_AGE)
+    return response
@@ -2,6 +2,9 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.safestring import mark_safe
 
+from api.pagination import EstimatedCountPaginator
+from recipes.admin_filters import (AutocompleteFilterMixin,
+                                   AutocompleteListFilter)
 from users.models import Follow, User
 
 
@@ -31,19 +34,18 @@ class UserAdmin(BaseUserAdmin):
             )
         return ''
 
-    @admin.display(description='Кол-во рецептов у пользователя')
-    def recipes_count(self, obj):
-        return obj.recipes.count()
-
-    @admin.display(description='Кол-во подписчиков у пользователя')
-    def followers_count(self, obj):
-        return obj.subscriptions_to_author.count()
-
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
     """Административный интерфейс для управления подписками."""
 
     list_display = ('id', 'user', 'author')
+    list_select_related = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ('user__username', 'author__username')
-    list_filter = ('user', 'author')
+    list_filter = (
+        ('user', AutocompleteListFilter),
+        ('author', AutocompleteListFilter),
+    )
+    autocomplete_fields = ('user', 'author')
@@ -3,6 +3,7 @@ from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.db import models
 
+from recipes.storage import ContentAddressedStorage
 from users.constants import LIMIT_EMAIL, LIMIT_USERNAME
 from users.validators import username_validator
 
@@ -40,9 +41,19 @@ class User(AbstractUser):
     avatar = models.ImageField(
         'Аватар',
         upload_to='users/%Y/%m/%d/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0, editable=False
+    )
+    avatar_variants = models.JSONField(
+        'Варианты аватара', default=dict, editable=False
+    )
 
     class Meta:
         verbose_name = 'Пользователь'